@@ -0,0 +1,216 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+
+log = logging.getLogger('adaptive_concurrency')
+
+# Latency below this is never treated as congestion, so jitter on very fast
+# calls (local caches, tiny responses) cannot halve the limit
+LATENCY_FLOOR = 0.05
+# Times run_limited retries a call that failed with 429/5xx
+OVERLOAD_RETRIES = 3
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit driven by observed latency and overload errors.
+
+    The in-flight limit grows by `increase` after each round of successful
+    calls (one round = `limit` successes) and is multiplied by `decrease` on
+    an overload signal (429/5xx) or when p95 latency rises above
+    `latency_tolerance` times its healthy baseline. Decreases are spaced by
+    at least one p95 so a single burst of errors only halves the limit once.
+    """
+
+    def __init__(self, name, initial=2, min_limit=1, max_limit=16, increase=1.0,
+                 decrease=0.5, window=20, latency_tolerance=2.0, overload_backoff=1.0):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.latency_tolerance = latency_tolerance
+        self.overload_backoff = overload_backoff  # Seconds run_limited waits after a 429
+
+        self.in_flight = 0
+        self.successes = 0
+        self.overloads = 0
+        self.decreases = 0
+        self._latencies = deque(maxlen=window)
+        self._baseline_p95 = None
+        self._round_successes = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        # Coroutines waiting for a slot, oldest first: [loop, future, granted]
+        self._async_waiters = deque()
+
+    def _p95(self):
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def acquire(self):
+        """
+        Block until a call slot is free
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """
+        Await a call slot without blocking the event loop.
+
+        Waiters queue in FIFO order and sleep until release() hands them a
+        slot, so thousands of pending coroutines cost nothing while they wait.
+        """
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if not self._async_waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = [loop, loop.create_future(), False]
+            self._async_waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._condition:
+                if waiter[2]:
+                    # The slot was handed over just as we were cancelled; pass it on
+                    self.in_flight -= 1
+                    self._wake_waiters()
+                else:
+                    self._async_waiters.remove(waiter)
+            raise
+
+    def _wake_waiters(self):
+        """
+        Hand free slots to queued coroutines, then let blocked threads retry.
+        Called with the condition held.
+        """
+        while self._async_waiters and self.in_flight < int(self.limit):
+            waiter = self._async_waiters.popleft()
+            waiter[2] = True
+            self.in_flight += 1
+            try:
+                waiter[0].call_soon_threadsafe(_resolve_waiter, waiter[1])
+            except RuntimeError:
+                # Event loop already closed; nobody will use the slot
+                self.in_flight -= 1
+        self._condition.notify_all()
+
+    def release(self, latency, overloaded=False):
+        """
+        Free a slot and feed back the call's latency (seconds) and outcome
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                self.overloads += 1
+                self._decrease("overload")
+            else:
+                self.successes += 1
+                self._latencies.append(latency)
+                self._observe_latency()
+            self._wake_waiters()
+
+    def _observe_latency(self):
+        if len(self._latencies) < self.window:
+            self._grow()
+            return
+        p95 = self._p95()
+        if self._baseline_p95 is None or p95 < self._baseline_p95:
+            self._baseline_p95 = p95
+        if p95 > max(self._baseline_p95, LATENCY_FLOOR) * self.latency_tolerance:
+            self._decrease(f"p95 {p95 * 1000:.0f}ms")
+        else:
+            # Let the baseline drift up slowly so it tracks time-of-day changes
+            self._baseline_p95 *= 1.001
+            self._grow()
+
+    def _grow(self):
+        self._round_successes += 1
+        if self._round_successes >= int(self.limit):
+            self._round_successes = 0
+            self.limit = min(self.max_limit, self.limit + self.increase)
+
+    def _decrease(self, reason):
+        now = time.monotonic()
+        cooldown = self._p95() if self._latencies else 1.0
+        if now - self._last_decrease < cooldown:
+            return
+        old_limit = int(self.limit)
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+        self._last_decrease = now
+        self._round_successes = 0
+        self._latencies.clear()
+        self.decreases += 1
+        log.warning(f"⚠️  {self.name}: concurrency {old_limit} → {int(self.limit)} ({reason})")
+
+    def metrics(self):
+        """
+        Current limit and counters, for progress output and dashboards
+        """
+        with self._condition:
+            return {
+                'name': self.name,
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'p95_ms': round(self._p95() * 1000) if self._latencies else None,
+                'baseline_p95_ms': round(self._baseline_p95 * 1000) if self._baseline_p95 else None,
+                'successes': self.successes,
+                'overloads': self.overloads,
+                'decreases': self.decreases,
+            }
+
+def _resolve_waiter(future):
+    if not future.done():
+        future.set_result(None)
+
+def is_overload_error(error):
+    """
+    429 and 5xx responses (requests/httpx HTTP errors) signal overload
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    return status is not None and (status == 429 or status >= 500)
+
+def run_limited(limiter, fn, *args, **kwargs):
+    """
+    Run a blocking call inside one of the limiter's slots and report its outcome.
+
+    Overload errors are retried up to OVERLOAD_RETRIES times, waiting outside
+    the slot: the limiter's overload_backoff after a 429, exponential after a
+    5xx. Clients passed in here should not retry on their own (e.g. pyairtable
+    Api(retry_strategy=False)), otherwise the limiter never sees the 429s.
+    """
+    for attempt in range(OVERLOAD_RETRIES + 1):
+        limiter.acquire()
+        start = time.monotonic()
+        overloaded = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            overloaded = is_overload_error(e)
+            if not overloaded or attempt == OVERLOAD_RETRIES:
+                raise
+            status = e.response.status_code
+        finally:
+            limiter.release(time.monotonic() - start, overloaded)
+        wait_time = limiter.overload_backoff if status == 429 else min(2 ** attempt, limiter.overload_backoff)
+        log.warning(f"⚠️  {limiter.name} returned {status}, retrying in {wait_time:.0f}s")
+        time.sleep(wait_time)
+
+# Shared controllers: every call site of the same service feeds the same limit
+# Airtable asks clients to wait 30 seconds after a 429
+AIRTABLE_LIMITER = AdaptiveLimiter('Airtable', initial=2, max_limit=10, overload_backoff=30)
+GEMINI_LIMITER = AdaptiveLimiter('Gemini', initial=2, max_limit=16)
+
+def print_limiter_metrics(*limiters):
+    for limiter in limiters or (AIRTABLE_LIMITER, GEMINI_LIMITER):
+        m = limiter.metrics()
+        log.info(f"📈 {m['name']}: limit {m['limit']}, in flight {m['in_flight']}, "
+                 f"p95 {m['p95_ms']}ms, {m['successes']} ok, {m['overloads']} overloaded")
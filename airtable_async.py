@@ -0,0 +1,140 @@
+import time
+import asyncio
+import logging
+from urllib.parse import quote
+import httpx
+from adaptive_concurrency import AIRTABLE_LIMITER
+from http_replay import async_transport
+
+log = logging.getLogger('airtable_async')
+
+# Airtable REST API limits
+AIRTABLE_API_URL = "https://api.airtable.com/v0"
+REQUESTS_PER_SECOND = 5      # Per-base rate limit
+MAX_RECORDS_PER_REQUEST = 10
+RATE_LIMIT_BACKOFF = 30      # Seconds Airtable asks clients to wait after a 429
+
+class AsyncRateLimiter:
+    """
+    Spaces request starts evenly so all coroutines share one per-second budget
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                wait_time = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self.interval
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+            # A pause that started while we slept invalidates the slot we were given
+            if time.monotonic() >= self._paused_until:
+                return
+
+    def pause(self, seconds):
+        """
+        Push every pending request back, e.g. after a 429, including those
+        already sleeping on a slot they were given before the pause
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._next_slot = max(self._next_slot, self._paused_until)
+
+class AsyncAirtable:
+    """
+    Minimal asyncio client for the Airtable REST API used by the high fan-out
+    compression and decompression paths. Mirrors the pyairtable Table methods
+    the scripts already use, with one rate limiter shared by every request.
+    In-flight requests are additionally capped by the adaptive (AIMD)
+    concurrency limiter, which backs off on 429/5xx and rising latency.
+    """
+
+    def __init__(self, api_token, base_id, rate=REQUESTS_PER_SECOND, max_retries=3,
+                 concurrency=AIRTABLE_LIMITER):
+        self.base_id = base_id
+        self.max_retries = max_retries
+        self.limiter = AsyncRateLimiter(rate)
+        self.concurrency = concurrency
+        self.client = httpx.AsyncClient(
+            base_url=f"{AIRTABLE_API_URL}/{base_id}/",
+            headers={'Authorization': f"Bearer {api_token}"},
+            timeout=30.0,
+            transport=async_transport()  # Default transport unless recording/replaying
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def request(self, method, table_name, path="", **kwargs):
+        url = quote(table_name, safe="") + path
+        for attempt in range(self.max_retries + 1):
+            await self.concurrency.acquire_async()
+            await self.limiter.acquire()
+            start = time.monotonic()
+            response = None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            finally:
+                overloaded = response is None or response.status_code == 429 or response.status_code >= 500
+                self.concurrency.release(time.monotonic() - start, overloaded)
+            if response.status_code == 429 and attempt < self.max_retries:
+                log.warning(f"⚠️  Airtable rate limit hit, pausing {RATE_LIMIT_BACKOFF}s")
+                self.limiter.pause(RATE_LIMIT_BACKOFF)
+                continue
+            if response.status_code >= 500 and attempt < self.max_retries:
+                # Same back-off as run_limited uses for 5xx on the sync path
+                wait_time = min(2 ** attempt, RATE_LIMIT_BACKOFF)
+                log.warning(f"⚠️  Airtable returned {response.status_code}, retrying in {wait_time}s")
+                await asyncio.sleep(wait_time)
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    async def all(self, table_name, formula=None, fields=None):
+        params = {}
+        if formula:
+            params['filterByFormula'] = formula
+        if fields:
+            params['fields[]'] = fields
+        records = []
+        while True:
+            page = await self.request('GET', table_name, params=params)
+            records.extend(page.get('records', []))
+            if 'offset' not in page:
+                return records
+            params['offset'] = page['offset']
+
+    async def create(self, table_name, fields):
+        return await self.request('POST', table_name, json={'fields': fields})
+
+    async def update(self, table_name, record_id, fields):
+        return await self.request('PATCH', table_name, f"/{record_id}", json={'fields': fields})
+
+    async def batch_create(self, table_name, fields_list):
+        chunks = [
+            fields_list[i:i + MAX_RECORDS_PER_REQUEST]
+            for i in range(0, len(fields_list), MAX_RECORDS_PER_REQUEST)
+        ]
+        responses = await asyncio.gather(*[
+            self.request('POST', table_name, json={'records': [{'fields': f} for f in chunk]})
+            for chunk in chunks
+        ])
+        return [record for response in responses for record in response['records']]
+
+    async def batch_delete(self, table_name, record_ids):
+        chunks = [
+            record_ids[i:i + MAX_RECORDS_PER_REQUEST]
+            for i in range(0, len(record_ids), MAX_RECORDS_PER_REQUEST)
+        ]
+        await asyncio.gather(*[
+            self.request('DELETE', table_name, params={'records[]': chunk})
+            for chunk in chunks
+        ])
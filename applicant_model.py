@@ -0,0 +1,66 @@
+import hashlib
+from typing import List, Union
+import msgspec
+
+# Typed model of the Compressed JSON blob shared by every script.
+# Structs are slotted and untracked by the GC (gc=False is safe because
+# they never form reference cycles), which keeps 100k+ decoded profiles
+# cheap to hold in memory.
+
+Number = Union[int, float]
+
+class Personal(msgspec.Struct, gc=False):
+    name: str = ""
+    email: str = ""
+    location: str = ""
+    linkedin: str = ""
+
+class Experience(msgspec.Struct, gc=False):
+    company: str = ""
+    title: str = ""
+    start: str = ""
+    end: str = ""
+    technologies: str = ""
+
+class Salary(msgspec.Struct, gc=False):
+    preferred_rate: Number = 0
+    minimum_rate: Number = 0
+    currency: str = "USD"
+    availability: Number = 0
+
+class Applicant(msgspec.Struct, gc=False):
+    personal: Personal = msgspec.field(default_factory=Personal)
+    experience: List[Experience] = msgspec.field(default_factory=list)
+    salary: Salary = msgspec.field(default_factory=Salary)
+    compressed_at: str = ""
+
+# Raised for malformed JSON and for JSON that does not match the model
+ApplicantDecodeError = msgspec.DecodeError
+
+_decoder = msgspec.json.Decoder(Applicant)
+_encoder = msgspec.json.Encoder()
+
+def decode_applicant(compressed_json):
+    """
+    Decode a Compressed JSON string (or bytes) into an Applicant
+    """
+    return _decoder.decode(compressed_json)
+
+def encode_applicant(applicant):
+    """
+    Encode an Applicant as a compact Compressed JSON string
+    """
+    return _encoder.encode(applicant).decode()
+
+def format_applicant(applicant, indent=2):
+    """
+    Encode an Applicant as indented JSON for display and prompts
+    """
+    return msgspec.json.format(_encoder.encode(applicant), indent=indent).decode()
+
+def fingerprint_applicant(applicant):
+    """
+    Stable hash of an applicant's content, ignoring when it was compressed
+    """
+    content = msgspec.structs.replace(applicant, compressed_at="")
+    return hashlib.sha256(_encoder.encode(content)).hexdigest()[:16]
@@ -0,0 +1,155 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+log = logging.getLogger('call_policy')
+
+class CallDeadlineExceeded(Exception):
+    """
+    Raised when an attempt does not finish within its deadline
+    """
+
+class CircuitBreaker:
+    """
+    Shared circuit breaker that pauses every caller during provider outages.
+
+    After `failure_threshold` consecutive retryable failures the circuit opens
+    and all callers block for `reset_timeout` seconds. A single probe call is
+    then let through: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._condition = threading.Condition()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self):
+        with self._condition:
+            return self._opened_at is not None
+
+    def acquire(self):
+        """
+        Block until the circuit lets a call through
+        """
+        with self._condition:
+            while self._opened_at is not None:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining <= 0 and not self._probe_in_flight:
+                    # Half-open: let exactly one probe through
+                    self._probe_in_flight = True
+                    return
+                self._condition.wait(timeout=remaining if remaining > 0 else None)
+
+    def record_success(self):
+        with self._condition:
+            if self._opened_at is not None:
+                log.info("✅ Circuit closed, resuming calls")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                if not self._probe_in_flight:
+                    log.warning(f"⚠️  Circuit opened after {self._failures} failures, "
+                                f"pausing calls for {self.reset_timeout}s")
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+            self._condition.notify_all()
+
+class CallPolicy:
+    """
+    Deadline, retry, hedging and circuit-breaker policy for a remote call.
+
+    Each attempt gets `timeout` seconds. If `hedge_after` is set and the first
+    request has not answered by then, a duplicate request is sent and whichever
+    finishes first wins. Errors for which `is_retryable` returns False are
+    raised immediately; retryable ones are retried up to `max_retries` times
+    with jittered exponential backoff. With a `limiter` (AdaptiveLimiter), each
+    attempt waits for a concurrency slot and reports its latency, and retryable
+    errors count as overload.
+    """
+
+    def __init__(self, is_retryable, timeout=30.0, max_retries=3, backoff_base=1.0,
+                 backoff_max=8.0, hedge_after=None, breaker=None, limiter=None, max_workers=8):
+        self.is_retryable = is_retryable
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+        # Attempts run on worker threads so a stalled request can be abandoned
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs) under the policy and return its result
+        """
+        attempt = 0
+        while True:
+            self.breaker.acquire()
+            try:
+                result = self._limited_attempt(fn, args, kwargs)
+            except Exception as e:
+                if not self.is_retryable(e):
+                    # The provider answered, so this says nothing about an outage
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                wait_time = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                log.warning(f"⚠️  Call failed, retrying in {wait_time:.1f}s... "
+                            f"(attempt {attempt}/{self.max_retries}): {str(e)}")
+                time.sleep(wait_time)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _limited_attempt(self, fn, args, kwargs):
+        if self.limiter is None:
+            return self._attempt(fn, args, kwargs)
+        self.limiter.acquire()
+        start = time.monotonic()
+        overloaded = False
+        try:
+            return self._attempt(fn, args, kwargs)
+        except Exception as e:
+            overloaded = self.is_retryable(e)
+            raise
+        finally:
+            self.limiter.release(time.monotonic() - start, overloaded)
+
+    def _attempt(self, fn, args, kwargs):
+        deadline = time.monotonic() + self.timeout
+        futures = [self._executor.submit(fn, *args, **kwargs)]
+
+        if self.hedge_after is not None and self.hedge_after < self.timeout:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                futures.append(self._executor.submit(fn, *args, **kwargs))
+
+        last_error = None
+        while futures:
+            remaining = deadline - time.monotonic()
+            done, pending = wait(futures, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise CallDeadlineExceeded(f"No response within {self.timeout}s")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+            futures = list(pending)
+        raise last_error
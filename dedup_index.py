@@ -0,0 +1,243 @@
+import os
+import re
+import struct
+import hashlib
+from collections import defaultdict
+from pyairtable import Api
+from dotenv import load_dotenv
+from applicant_model import decode_applicant, ApplicantDecodeError
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Airtable API
+api = Api(os.getenv('AIRTABLE_API_TOKEN'))
+base = api.base(os.getenv('AIRTABLE_BASE_ID'))
+applicants_table = base.table('Applicants')
+
+# MinHash / LSH settings: 16 bands of 4 rows puts the match threshold near 0.5
+# Jaccard for candidate generation; candidates are then checked against
+# FUZZY_THRESHOLD on the full signature
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+FUZZY_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.sha256(b'a%d' % i).digest()[:8], 'big') % _MERSENNE_PRIME or 1,
+        int.from_bytes(hashlib.sha256(b'b%d' % i).digest()[:8], 'big') % _MERSENNE_PRIME
+    )
+    for i in range(NUM_PERM)
+]
+
+def _hash_key(value):
+    return hashlib.blake2b(value.encode('utf-8'), digest_size=8).hexdigest()
+
+def normalize_email(email):
+    """
+    Lowercase, drop +tags, and drop dots in Gmail local parts
+    """
+    email = (email or '').strip().lower()
+    if '@' not in email:
+        return ''
+    local, domain = email.rsplit('@', 1)
+    local = local.split('+', 1)[0]
+    if domain in ('gmail.com', 'googlemail.com'):
+        local = local.replace('.', '')
+        domain = 'gmail.com'
+    return f"{local}@{domain}"
+
+def normalize_linkedin(url):
+    """
+    Reduce a LinkedIn profile URL to its /in/<slug>
+    """
+    match = re.search(r'linkedin\.com/in/([^/?#]+)', (url or '').lower())
+    return match.group(1) if match else ''
+
+def normalize_text(text):
+    return ' '.join(re.findall(r'[a-z0-9]+', (text or '').lower()))
+
+def history_fingerprint(applicant):
+    """
+    Normalized name plus the set of (company, start year) pairs
+    """
+    name = normalize_text(applicant.personal.name)
+    history = sorted({
+        (normalize_text(exp.company), exp.start[:4]) for exp in applicant.experience if exp.company
+    })
+    if not name or not history:
+        return ''
+    return name + '|' + ';'.join(f"{company}@{year}" for company, year in history)
+
+def exact_keys(applicant):
+    """
+    Hashed identity keys: any shared key marks two applicants as the same person
+    """
+    keys = []
+    email = normalize_email(applicant.personal.email)
+    if email:
+        keys.append('email:' + _hash_key(email))
+    linkedin = normalize_linkedin(applicant.personal.linkedin)
+    if linkedin:
+        keys.append('linkedin:' + _hash_key(linkedin))
+    fingerprint = history_fingerprint(applicant)
+    if fingerprint:
+        keys.append('history:' + _hash_key(fingerprint))
+    return keys
+
+def shingles(applicant):
+    """
+    Token set used for fuzzy matching: name, companies, titles and technologies
+    """
+    tokens = set(normalize_text(applicant.personal.name).split())
+    for exp in applicant.experience:
+        tokens.update('c:' + t for t in normalize_text(exp.company).split())
+        tokens.update('t:' + t for t in normalize_text(exp.title).split())
+        tokens.update('x:' + t for t in normalize_text(exp.technologies).split())
+    return tokens
+
+def minhash(tokens):
+    """
+    MinHash signature of a token set
+    """
+    hashes = [
+        struct.unpack('<Q', hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest())[0]
+        for t in tokens
+    ]
+    if not hashes:
+        return None
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+def estimated_similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+class DedupIndex:
+    """
+    Duplicate-applicant index: hashed exact keys with O(1) lookup, union-find
+    clusters over shared keys, and MinHash LSH buckets for fuzzy matches
+    """
+
+    def __init__(self):
+        self.key_owners = {}                 # exact key -> first applicant ID seen
+        self.parent = {}                     # union-find over applicant IDs
+        self.signatures = {}                 # applicant ID -> MinHash signature
+        self.buckets = defaultdict(list)     # (band, band hash) -> applicant IDs
+
+    def _find(self, applicant_id):
+        root = applicant_id
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[applicant_id] != root:
+            self.parent[applicant_id], applicant_id = root, self.parent[applicant_id]
+        return root
+
+    def _union(self, a, b):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def add(self, applicant_id, applicant):
+        """
+        Index an applicant; returns the IDs it exactly duplicates
+        """
+        self.parent.setdefault(applicant_id, applicant_id)
+        matches = set()
+        for key in exact_keys(applicant):
+            owner = self.key_owners.setdefault(key, applicant_id)
+            if owner != applicant_id:
+                matches.add(owner)
+                self._union(owner, applicant_id)
+
+        signature = minhash(shingles(applicant))
+        if signature is not None:
+            self.signatures[applicant_id] = signature
+            for band in range(BANDS):
+                rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+                self.buckets[(band, hash(rows))].append(applicant_id)
+        return matches
+
+    def clusters(self):
+        """
+        Exact-duplicate clusters with more than one applicant
+        """
+        groups = defaultdict(set)
+        for applicant_id in self.parent:
+            groups[self._find(applicant_id)].add(applicant_id)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+    def fuzzy_matches(self, applicant_id, threshold=FUZZY_THRESHOLD):
+        """
+        Likely duplicates that share no exact key, with estimated similarity
+        """
+        signature = self.signatures.get(applicant_id)
+        if signature is None:
+            return []
+        candidates = set()
+        for band in range(BANDS):
+            rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+            candidates.update(self.buckets.get((band, hash(rows)), ()))
+        root = self._find(applicant_id)
+        matches = []
+        for other in candidates:
+            if other == applicant_id or self._find(other) == root:
+                continue
+            similarity = estimated_similarity(signature, self.signatures[other])
+            if similarity >= threshold:
+                matches.append((other, similarity))
+        return sorted(matches, key=lambda match: -match[1])
+
+def build_index(records):
+    """
+    Build a DedupIndex from Applicants records with Compressed JSON
+    """
+    index = DedupIndex()
+    for record in records:
+        applicant_id = record['fields'].get('Applicant ID')
+        compressed_json = record['fields'].get('Compressed JSON')
+        if not applicant_id or not compressed_json:
+            continue
+        try:
+            index.add(applicant_id, decode_applicant(compressed_json))
+        except ApplicantDecodeError as e:
+            print(f"⚠️  Skipping {applicant_id}: {str(e)}")
+    return index
+
+def report_duplicates():
+    """
+    Print exact-duplicate clusters and fuzzy matches across all applicants
+    """
+    try:
+        print("=== Duplicate Applicant Report ===")
+        records = applicants_table.all(fields=['Applicant ID', 'Compressed JSON'])
+        index = build_index(records)
+
+        clusters = index.clusters()
+        print(f"\nExact duplicate clusters: {len(clusters)}")
+        for cluster in clusters:
+            print(f"  • {', '.join(cluster)}")
+
+        print("\nFuzzy matches:")
+        reported = set()
+        for applicant_id in sorted(index.signatures):
+            for other, similarity in index.fuzzy_matches(applicant_id):
+                pair = tuple(sorted((applicant_id, other)))
+                if pair not in reported:
+                    reported.add(pair)
+                    print(f"  • {pair[0]} ~ {pair[1]} ({similarity:.0%})")
+        if not reported:
+            print("  None")
+
+        print(f"\n=== Summary ===")
+        print(f"Indexed: {len(index.parent)} applicants")
+        print(f"Duplicates: {sum(len(c) - 1 for c in clusters)} exact, {len(reported)} fuzzy pairs")
+
+    except Exception as e:
+        print(f"❌ Error building duplicate report: {str(e)}")
+
+if __name__ == "__main__":
+    report_duplicates()
@@ -0,0 +1,202 @@
+import os
+import json
+import argparse
+from datetime import datetime, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyairtable import Api
+from dotenv import load_dotenv
+from applicant_model import decode_applicant, ApplicantDecodeError
+from shortlist_automation import calculate_experience_years
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Airtable API
+api = Api(os.getenv('AIRTABLE_API_TOKEN'))
+base = api.base(os.getenv('AIRTABLE_BASE_ID'))
+applicants_table = base.table('Applicants')
+
+EXPORT_DIR = 'exports'
+STATE_FILE = '_export_state.json'
+PAGE_SIZE = 100  # Airtable's maximum page size
+
+EXPORT_FIELDS = [
+    'Applicant ID', 'Compressed JSON', 'Shortlist Status',
+    'LLM Summary', 'LLM Score', 'LLM Follow-Ups', 'LLM Version'
+]
+
+APPLICANT_SCHEMA = pa.schema([
+    ('applicant_id', pa.string()),
+    ('record_id', pa.string()),
+    ('name', pa.string()),
+    ('email', pa.string()),
+    ('location', pa.string()),
+    ('linkedin', pa.string()),
+    ('experience_count', pa.int32()),
+    ('experience_years', pa.float64()),
+    ('companies', pa.list_(pa.string())),
+    ('preferred_rate', pa.float64()),
+    ('minimum_rate', pa.float64()),
+    ('currency', pa.string()),
+    ('availability', pa.float64()),
+    ('shortlist_status', pa.string()),
+    ('llm_score', pa.float64()),
+    ('llm_summary', pa.string()),
+    ('llm_follow_ups', pa.string()),
+    ('llm_version', pa.string()),
+    ('compressed_at', pa.string()),
+    ('exported_at', pa.timestamp('us', tz='UTC')),
+])
+
+EXPERIENCE_SCHEMA = pa.schema([
+    ('applicant_id', pa.string()),
+    ('position', pa.int32()),
+    ('company', pa.string()),
+    ('title', pa.string()),
+    ('start', pa.string()),
+    ('end', pa.string()),
+    ('technologies', pa.string()),
+    ('exported_at', pa.timestamp('us', tz='UTC')),
+])
+
+def flatten_applicant(record, exported_at):
+    """
+    Flatten an Applicants record and its Compressed JSON into export rows:
+    one applicant row plus one row per work experience entry
+    """
+    fields = record['fields']
+    applicant_id = fields.get('Applicant ID')
+    data = decode_applicant(fields['Compressed JSON'])
+
+    applicant_row = {
+        'applicant_id': applicant_id,
+        'record_id': record['id'],
+        'name': data.personal.name,
+        'email': data.personal.email,
+        'location': data.personal.location,
+        'linkedin': data.personal.linkedin,
+        'experience_count': len(data.experience),
+        'experience_years': calculate_experience_years(data.experience),
+        'companies': [exp.company for exp in data.experience if exp.company],
+        'preferred_rate': data.salary.preferred_rate,
+        'minimum_rate': data.salary.minimum_rate,
+        'currency': data.salary.currency,
+        'availability': data.salary.availability,
+        'shortlist_status': fields.get('Shortlist Status'),
+        'llm_score': fields.get('LLM Score'),
+        'llm_summary': fields.get('LLM Summary'),
+        'llm_follow_ups': fields.get('LLM Follow-Ups'),
+        'llm_version': fields.get('LLM Version'),
+        'compressed_at': data.compressed_at,
+        'exported_at': exported_at,
+    }
+
+    experience_rows = [
+        {
+            'applicant_id': applicant_id,
+            'position': position,
+            'company': exp.company,
+            'title': exp.title,
+            'start': exp.start,
+            'end': exp.end,
+            'technologies': exp.technologies,
+            'exported_at': exported_at,
+        }
+        for position, exp in enumerate(data.experience)
+    ]
+    return applicant_row, experience_rows
+
+def load_state(out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(out_dir, state):
+    with open(os.path.join(out_dir, STATE_FILE), 'w') as f:
+        json.dump(state, f, indent=2)
+
+def partition_path(out_dir, dataset, exported_at):
+    """
+    Hive-style partition directory, readable by DuckDB/pandas/pyarrow
+    """
+    path = os.path.join(out_dir, dataset, f"export_date={exported_at.date().isoformat()}")
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, f"part-{exported_at.strftime('%Y%m%dT%H%M%S%f')}.parquet")
+
+def export_applicants(out_dir=EXPORT_DIR, incremental=False):
+    """
+    Stream applicants from Airtable once and write them to partitioned Parquet.
+
+    In incremental mode only applicants modified since the previous export are
+    written, as new part files appended next to the earlier ones; readers keep
+    the row with the latest exported_at per applicant_id.
+    """
+    try:
+        print("=== Parquet Export ===")
+        os.makedirs(out_dir, exist_ok=True)
+        state = load_state(out_dir)
+        exported_at = datetime.now(timezone.utc)
+
+        formula = "{Compressed JSON} != ''"
+        if incremental and state.get('last_export'):
+            formula = f"AND({formula}, IS_AFTER(LAST_MODIFIED_TIME(), '{state['last_export']}'))"
+            print(f"Incremental export of changes since {state['last_export']}")
+
+        # Part files are only created once there are rows for them, so a run
+        # with no changes leaves no empty files behind
+        writers = {}
+        
+        def write_rows(dataset, rows, schema):
+            if not rows:
+                return
+            if dataset not in writers:
+                writers[dataset] = pq.ParquetWriter(partition_path(out_dir, dataset, exported_at), schema)
+            writers[dataset].write_table(pa.Table.from_pylist(rows, schema))
+
+        exported = 0
+        skipped = 0
+        try:
+            # One Airtable page at a time keeps memory flat regardless of table size
+            for page in applicants_table.iterate(
+                formula=formula, fields=EXPORT_FIELDS, page_size=PAGE_SIZE
+            ):
+                applicant_rows = []
+                experience_rows = []
+                for record in page:
+                    try:
+                        applicant_row, rows = flatten_applicant(record, exported_at)
+                    except ApplicantDecodeError as e:
+                        print(f"⚠️  Skipping {record['fields'].get('Applicant ID')}: {str(e)}")
+                        skipped += 1
+                        continue
+                    applicant_rows.append(applicant_row)
+                    experience_rows.extend(rows)
+
+                write_rows('applicants', applicant_rows, APPLICANT_SCHEMA)
+                write_rows('experience', experience_rows, EXPERIENCE_SCHEMA)
+                exported += len(applicant_rows)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        state['last_export'] = exported_at.isoformat()
+        save_state(out_dir, state)
+
+        print(f"✅ Exported {exported} applicants to {out_dir}")
+        if skipped:
+            print(f"⚠️  Skipped {skipped} applicants with invalid JSON")
+
+    except Exception as e:
+        print(f"❌ Error exporting applicants: {str(e)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export decoded applicant profiles to Parquet")
+    parser.add_argument('--out', default=EXPORT_DIR, help="Output directory")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only export applicants modified since the last export")
+    args = parser.parse_args()
+
+    export_applicants(args.out, args.incremental)
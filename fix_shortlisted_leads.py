@@ -1,6 +1,9 @@
 import os
+import logging
+from collections import Counter
 from pyairtable import Api
 from dotenv import load_dotenv
+from structured_logging import setup_logging_from_argv
 
 # Load environment variables
 load_dotenv()
@@ -11,85 +14,130 @@ base = api.base(os.getenv('AIRTABLE_BASE_ID'))
 applicants_table = base.table('Applicants')
 shortlisted_table = base.table('Shortlisted Leads')
 
+log = logging.getLogger('fix_shortlisted_leads')
+
+# Shortlisted Leads are upserted on this text field (see shortlist_automation)
+MERGE_FIELDS = ['Applicant ID']
+
+def backfill_lead_applicant_ids():
+    """
+    One-off migration: copy the linked applicant's ID onto leads created
+    before Shortlisted Leads carried an 'Applicant ID' merge key
+    """
+    try:
+        log.info("=== Backfilling Lead Applicant IDs ===")
+        
+        # Map applicant record IDs to their Applicant ID
+        applicant_ids = {
+            record['id']: record['fields'].get('Applicant ID')
+            for record in applicants_table.all(fields=['Applicant ID'])
+        }
+        
+        legacy_leads = shortlisted_table.all(
+            formula="{Applicant ID} = ''", fields=['Applicant']
+        )
+        
+        updates = []
+        for lead in legacy_leads:
+            linked = lead['fields'].get('Applicant', [])
+            if linked and applicant_ids.get(linked[0]):
+                updates.append({
+                    'id': lead['id'],
+                    'fields': {'Applicant ID': applicant_ids[linked[0]]}
+                })
+        
+        if updates:
+            shortlisted_table.batch_update(updates)
+        log.info(f"Backfilled {len(updates)} of {len(legacy_leads)} legacy leads")
+        
+    except Exception as e:
+        log.error(f"❌ Error backfilling lead applicant IDs: {str(e)}")
+
 def check_and_fix_shortlisted_leads():
     """
-    Check for applicants marked as shortlisted but missing from Shortlisted Leads table
+    Check for applicants marked as shortlisted but missing from Shortlisted Leads table.
+    
+    Leads are created with an upsert keyed on Applicant ID, so this only
+    needs to run once after backfill_lead_applicant_ids() - not periodically.
     """
     try:
-        print("=== Checking Shortlisted Leads ===")
+        log.info("=== Checking Shortlisted Leads ===")
         
         # Get all shortlisted applicants
         shortlisted_applicants = applicants_table.all(formula="{Shortlist Status} = 'Shortlisted'")
-        print(f"Found {len(shortlisted_applicants)} applicants marked as shortlisted")
-        
-        # Get existing shortlisted leads
-        existing_leads = shortlisted_table.all()
-        print(f"Found {len(existing_leads)} records in Shortlisted Leads table")
+        log.info(f"Found {len(shortlisted_applicants)} applicants marked as shortlisted")
         
-        # Get applicant IDs that already have leads
-        existing_lead_applicant_ids = []
-        for lead in existing_leads:
-            if 'Applicant' in lead['fields']:
-                existing_lead_applicant_ids.extend(lead['fields']['Applicant'])
+        # Only the merge key is needed to detect existing leads
+        existing_leads = shortlisted_table.all(fields=['Applicant ID'])
+        log.info(f"Found {len(existing_leads)} records in Shortlisted Leads table")
         
-        print(f"Existing lead applicant record IDs: {existing_lead_applicant_ids}")
+        existing_lead_applicant_ids = {
+            lead['fields'].get('Applicant ID') for lead in existing_leads
+        }
         
-        # Create missing leads
-        created = 0
+        # Queue missing leads
+        missing_leads = []
         for applicant in shortlisted_applicants:
             applicant_id = applicant['fields'].get('Applicant ID')
-            applicant_record_id = applicant['id']
-            compressed_json = applicant['fields'].get('Compressed JSON', '')
-            
-            print(f"\nChecking {applicant_id} (record ID: {applicant_record_id})")
             
-            # Check if this applicant already has a lead
-            if applicant_record_id not in existing_lead_applicant_ids:
-                print(f"  → Creating missing shortlisted lead for {applicant_id}")
-                
-                # Create the lead
-                lead_data = {
-                    'Applicant': [applicant_record_id],
-                    'Compressed JSON': compressed_json,
-                    'Score Reason': 'Qualified candidate meeting all shortlist criteria: experience, compensation, and location requirements.'
-                }
-                
-                try:
-                    new_lead = shortlisted_table.create(lead_data)
-                    print(f"  ✅ Created lead for {applicant_id}")
-                    created += 1
-                except Exception as e:
-                    print(f"  ❌ Error creating lead for {applicant_id}: {str(e)}")
-            else:
-                print(f"  ✅ {applicant_id} already has a shortlisted lead")
+            if not applicant_id:
+                log.warning(f"⚠️  Skipping {applicant['id']}: Missing Applicant ID")
+            elif applicant_id not in existing_lead_applicant_ids:
+                log.debug("→ Creating missing shortlisted lead", extra={'applicant_id': applicant_id})
+                missing_leads.append({
+                    'fields': {
+                        'Applicant ID': applicant_id,
+                        'Applicant': [applicant['id']],
+                        'Compressed JSON': applicant['fields'].get('Compressed JSON', ''),
+                        'Score Reason': 'Qualified candidate meeting all shortlist criteria: experience, compensation, and location requirements.'
+                    }
+                })
         
-        print(f"\n=== Summary ===")
-        print(f"Created {created} new shortlisted leads")
+        # Upsert so a concurrent shortlist run cannot produce a duplicate
+        created = 0
+        if missing_leads:
+            try:
+                result = shortlisted_table.batch_upsert(missing_leads, key_fields=MERGE_FIELDS)
+                created = len(result['createdRecords'])
+            except Exception as e:
+                log.error(f"❌ Error creating missing leads: {str(e)}")
         
-        # Show final counts
-        final_leads = shortlisted_table.all()
-        print(f"Total shortlisted leads now: {len(final_leads)}")
+        log.info("=== Summary ===")
+        log.info(f"Created {created} new shortlisted leads")
+        log.info(f"Total shortlisted leads now: {len(existing_leads) + created}")
         
     except Exception as e:
-        print(f"❌ Error checking shortlisted leads: {str(e)}")
+        log.error(f"❌ Error checking shortlisted leads: {str(e)}")
 
 def show_shortlisted_status():
     """
     Show current shortlist status of all applicants
     """
     try:
-        print("\n=== Current Applicant Status ===")
+        log.info("=== Current Applicant Status ===")
         all_applicants = applicants_table.all()
         
+        # Per-applicant lines only with debug output; counts always
+        statuses = Counter()
+        missing_json = 0
         for applicant in all_applicants:
             applicant_id = applicant['fields'].get('Applicant ID', 'Unknown')
             status = applicant['fields'].get('Shortlist Status', 'No Status')
             has_json = bool(applicant['fields'].get('Compressed JSON'))
-            print(f"{applicant_id}: {status} (JSON: {'✅' if has_json else '❌'})")
+            statuses[status] += 1
+            missing_json += not has_json
+            log.debug(f"{status} (JSON: {'✅' if has_json else '❌'})", extra={'applicant_id': applicant_id})
+        
+        for status, count in statuses.most_common():
+            log.info(f"{status}: {count}")
+        if missing_json:
+            log.warning(f"⚠️  {missing_json} applicants have no Compressed JSON")
             
     except Exception as e:
-        print(f"❌ Error showing status: {str(e)}")
+        log.error(f"❌ Error showing status: {str(e)}")
 
 if __name__ == "__main__":
+    setup_logging_from_argv("Backfill and repair Shortlisted Leads")
     show_shortlisted_status()
+    backfill_lead_applicant_ids()
     check_and_fix_shortlisted_leads()
\ No newline at end of file
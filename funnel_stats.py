@@ -0,0 +1,302 @@
+import os
+import json
+import logging
+import sqlite3
+import argparse
+import threading
+from datetime import date
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+FUNNEL_DB_PATH = os.getenv('FUNNEL_DB_PATH', 'funnel_stats.db')
+
+log = logging.getLogger('funnel_stats')
+
+CRITERIA = ['experience', 'compensation', 'location']
+
+# Stored per applicant; None means that step has not run for the applicant yet.
+# The weeks are when each step first ran and never move afterwards.
+OUTCOME_COLUMNS = [
+    'location', 'companies', 'experience', 'compensation', 'location_ok',
+    'qualified', 'shortlist_week', 'llm_score', 'llm_week', 'shortlist_error',
+]
+EMPTY_OUTCOME = {
+    'location': 'Unknown', 'companies': [],
+    'experience': None, 'compensation': None, 'location_ok': None,
+    'qualified': None, 'shortlist_week': None,
+    'llm_score': None, 'llm_week': None, 'shortlist_error': None,
+}
+WEEK_FIELDS = ['shortlist_week', 'llm_week']
+
+def current_week():
+    year, week, _ = date.today().isocalendar()
+    return f"{year}-W{week:02d}"
+
+def applicant_location(applicant):
+    return applicant.personal.location.strip() or 'Unknown'
+
+def applicant_companies(applicant):
+    return sorted({exp.company.strip() for exp in applicant.experience if exp.company.strip()})
+
+def contributions(row):
+    """
+    Aggregate cells one applicant adds to: (dimension, key, metric) -> amount.
+
+    Shortlist outcomes count under 'all', the applicant's location, each of
+    their companies and the week they were first evaluated; LLM scores the
+    same, with the week they were first scored. An evaluation that could not
+    decode the applicant counts only as an 'error'.
+    """
+    cells = {}
+    places = [('location', row['location'])] + [('company', c) for c in row['companies']]
+
+    if row['shortlist_error']:
+        for dimension, key in [('all', ''), ('week', row['shortlist_week'])] + places:
+            cells[(dimension, key, 'error')] = 1
+    elif row['qualified'] is not None:
+        met = {'experience': row['experience'], 'compensation': row['compensation'],
+               'location': row['location_ok']}
+        metrics = ['evaluated'] + [f"failed:{c}" for c in CRITERIA if not met[c]]
+        if row['qualified']:
+            metrics.append('qualified')
+        for dimension, key in [('all', ''), ('week', row['shortlist_week'])] + places:
+            for metric in metrics:
+                cells[(dimension, key, metric)] = 1
+
+    if row['llm_score'] is not None:
+        for dimension, key in [('all', ''), ('week', row['llm_week'])] + places:
+            cells[(dimension, key, 'scored')] = 1
+            cells[(dimension, key, 'score_sum')] = row['llm_score']
+            cells[(dimension, key, f"score:{row['llm_score']}")] = 1
+    return cells
+
+class FunnelStats:
+    """
+    Shortlist funnel and LLM score aggregates, maintained incrementally.
+
+    Each applicant's last outcome is kept alongside the aggregates, so a
+    re-evaluation subtracts the old contribution and adds the new one in one
+    transaction instead of recomputing anything. Reports are key lookups.
+    """
+
+    def __init__(self, path=FUNNEL_DB_PATH):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outcomes (
+                applicant_id TEXT PRIMARY KEY,
+                location TEXT NOT NULL,
+                companies TEXT NOT NULL,
+                experience INTEGER,
+                compensation INTEGER,
+                location_ok INTEGER,
+                qualified INTEGER,
+                shortlist_week TEXT,
+                llm_score INTEGER,
+                llm_week TEXT,
+                shortlist_error INTEGER
+            )
+        """)
+        # Databases created before error outcomes were tracked
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(outcomes)")}
+        if 'shortlist_error' not in columns:
+            self.conn.execute("ALTER TABLE outcomes ADD COLUMN shortlist_error INTEGER")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS aggregates (
+                dimension TEXT NOT NULL,
+                key TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (dimension, key, metric)
+            )
+        """)
+
+    def _load(self, applicant_id):
+        row = self.conn.execute(
+            f"SELECT {', '.join(OUTCOME_COLUMNS)} FROM outcomes WHERE applicant_id = ?",
+            (applicant_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        outcome = dict(zip(OUTCOME_COLUMNS, row))
+        outcome['companies'] = json.loads(outcome['companies'])
+        return outcome
+
+    def _apply(self, changes):
+        """
+        Merge (applicant_id, changed fields) into each stored outcome and move
+        its contribution in the aggregates, all in one transaction
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                deltas = {}
+                for applicant_id, changed in changes:
+                    old = self._load(applicant_id)
+                    new = {**EMPTY_OUTCOME, **(old or {}), **changed}
+                    # Weeks are set the first time a step runs, so re-runs
+                    # do not move everyone into the current week
+                    for field in WEEK_FIELDS:
+                        if old and old[field]:
+                            new[field] = old[field]
+                    for cell, amount in (contributions(old) if old else {}).items():
+                        deltas[cell] = deltas.get(cell, 0) - amount
+                    for cell, amount in contributions(new).items():
+                        deltas[cell] = deltas.get(cell, 0) + amount
+                    self.conn.execute(
+                        f"INSERT OR REPLACE INTO outcomes (applicant_id, {', '.join(OUTCOME_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * (len(OUTCOME_COLUMNS) + 1))})",
+                        [applicant_id] + [json.dumps(new[c]) if c == 'companies' else new[c]
+                                          for c in OUTCOME_COLUMNS]
+                    )
+                changed_cells = [(*cell, amount) for cell, amount in deltas.items() if amount]
+                self.conn.executemany(
+                    "INSERT INTO aggregates (dimension, key, metric, value) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(dimension, key, metric) DO UPDATE SET value = value + excluded.value",
+                    changed_cells
+                )
+                # Drop cells that fell back to zero (e.g. a location nobody is in any more)
+                self.conn.executemany(
+                    "DELETE FROM aggregates WHERE dimension = ? AND key = ? AND metric = ? AND value = 0",
+                    [cell[:3] for cell in changed_cells]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def record_shortlist(self, outcomes):
+        """
+        Record (Applicant ID, evaluate_candidate() result) pairs.
+        Evaluations that failed to decode the applicant are counted as errors
+        rather than as failures of every criterion.
+        """
+        week = current_week()
+        changes = []
+        for applicant_id, evaluation in outcomes:
+            if evaluation.get('error'):
+                # Keep the last known location and companies
+                changes.append((applicant_id, {
+                    'experience': None, 'compensation': None, 'location_ok': None,
+                    'qualified': None, 'shortlist_week': week, 'shortlist_error': 1,
+                }))
+                continue
+            changes.append((applicant_id, {
+                'location': (evaluation['summary'].get('location') or '').strip() or 'Unknown',
+                'companies': evaluation['summary'].get('companies', []),
+                'experience': int(evaluation['criteria_met']['experience']),
+                'compensation': int(evaluation['criteria_met']['compensation']),
+                'location_ok': int(evaluation['criteria_met']['location']),
+                'qualified': int(evaluation['qualified']),
+                'shortlist_week': week,
+                'shortlist_error': None,
+            }))
+        self._apply(changes)
+
+    def record_llm_scores(self, scores):
+        """
+        Record (Applicant ID, Applicant, LLM Score) triples
+        """
+        week = current_week()
+        self._apply([
+            (applicant_id, {
+                'location': applicant_location(applicant),
+                'companies': applicant_companies(applicant),
+                'llm_score': int(score),
+                'llm_week': week,
+            })
+            for applicant_id, applicant, score in scores if score is not None
+        ])
+
+    def metrics(self, dimension='all', key=''):
+        """
+        All metrics for one cell, e.g. ('week', '2025-W03') or ('location', 'Berlin')
+        """
+        return dict(self.conn.execute(
+            "SELECT metric, value FROM aggregates WHERE dimension = ? AND key = ?",
+            (dimension, key)
+        ))
+
+    def breakdown(self, dimension, metric='evaluated', top=10):
+        """
+        Keys of a dimension ranked by one metric, with all their metrics
+        """
+        keys = [key for key, in self.conn.execute(
+            "SELECT key FROM aggregates WHERE dimension = ? AND metric = ? "
+            "ORDER BY value DESC, key LIMIT ?",
+            (dimension, metric, top)
+        )]
+        return [(key, self.metrics(dimension, key)) for key in keys]
+
+def record_shortlist_outcomes(outcomes, stats=None):
+    """
+    Best-effort update from the shortlist job; never fails the run
+    """
+    try:
+        (stats or default_stats()).record_shortlist(outcomes)
+    except Exception as e:
+        log.warning(f"⚠️  Could not update funnel stats: {str(e)}")
+
+def record_llm_scores(scores, stats=None):
+    """
+    Best-effort update from the Gemini job; never fails the run
+    """
+    try:
+        (stats or default_stats()).record_llm_scores(scores)
+    except Exception as e:
+        log.warning(f"⚠️  Could not update funnel stats: {str(e)}")
+
+_default_stats = None
+
+def default_stats():
+    global _default_stats
+    if _default_stats is None:
+        _default_stats = FunnelStats()
+    return _default_stats
+
+def format_funnel(m):
+    evaluated = m.get('evaluated', 0)
+    failed = ', '.join(f"{c} {m.get(f'failed:{c}', 0)}" for c in CRITERIA)
+    line = f"{evaluated} evaluated, {m.get('qualified', 0)} qualified (failed: {failed})"
+    if m.get('error'):
+        line += f", {m['error']} unreadable"
+    if m.get('scored'):
+        line += f", LLM avg {m['score_sum'] / m['scored']:.1f} over {m['scored']}"
+    return line
+
+def print_report(week=None, top=10, stats=None):
+    """
+    Print the funnel, score histogram and location/company breakdowns
+    """
+    try:
+        stats = stats or FunnelStats()
+        print("=== Shortlist Funnel ===")
+        overall = stats.metrics()
+        print(f"All time: {format_funnel(overall)}")
+        week = week or current_week()
+        print(f"Week {week}: {format_funnel(stats.metrics('week', week))}")
+        
+        print("\n=== LLM Score Distribution ===")
+        counts = [overall.get(f"score:{score}", 0) for score in range(1, 11)]
+        peak = max(counts)
+        for score, count in enumerate(counts, 1):
+            bar = '█' * round(40 * count / peak) if peak else ''
+            print(f"{score:>3}: {count:>7} {bar}")
+        
+        for dimension in ('location', 'company'):
+            print(f"\n=== Top {top} by {dimension} ===")
+            for key, m in stats.breakdown(dimension, top=top):
+                print(f"  {key}: {format_funnel(m)}")
+        
+    except Exception as e:
+        print(f"❌ Error building funnel report: {str(e)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report shortlist funnel and LLM score statistics")
+    parser.add_argument('--week', help="ISO week to report, e.g. 2025-W03 (default: this week)")
+    parser.add_argument('--top', type=int, default=10, help="Rows per location/company breakdown")
+    args = parser.parse_args()
+
+    print_report(args.week, args.top)
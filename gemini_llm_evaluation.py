@@ -1,32 +1,76 @@
 import os
-import json
-import time
+import hashlib
+import logging
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from pyairtable import Api
 from dotenv import load_dotenv
+from call_policy import CallPolicy, CircuitBreaker, CallDeadlineExceeded
+from applicant_model import decode_applicant, format_applicant, fingerprint_applicant, ApplicantDecodeError
+from worker_shards import in_shard
+from adaptive_concurrency import GEMINI_LIMITER, AIRTABLE_LIMITER, run_limited, print_limiter_metrics
+from structured_logging import Progress, setup_logging_from_argv
+from funnel_stats import record_llm_scores
+import http_replay
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Airtable API
-api = Api(os.getenv('AIRTABLE_API_TOKEN'))
+# Initialize Airtable API; 429s are retried by run_limited so the
+# adaptive limiter sees them, rather than inside the requests session
+api = Api(os.getenv('AIRTABLE_API_TOKEN'), retry_strategy=False)
 base = api.base(os.getenv('AIRTABLE_BASE_ID'))
 applicants_table = base.table('Applicants')
 
+log = logging.getLogger('gemini_llm_evaluation')
+
 # Configure Gemini
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+GEMINI_MODEL = 'gemini-1.5-flash'
+GEMINI_TEMPERATURE = 0.3
+GEMINI_MAX_OUTPUT_TOKENS = 500
 if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    # gRPC cannot be recorded, so recording/replaying switches Gemini to REST
+    genai.configure(api_key=GEMINI_API_KEY, transport='rest' if http_replay.is_active() else None)
+    model = genai.GenerativeModel(GEMINI_MODEL)
+
+# Gemini call policy
+GEMINI_TIMEOUT = 30          # Seconds per attempt
+GEMINI_MAX_RETRIES = 3
+GEMINI_HEDGE_AFTER = None    # Seconds before sending a duplicate request (None = no hedging)
+
+# Errors worth retrying: rate limits, provider-side failures and timeouts
+RETRYABLE_GEMINI_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServerError,
+    google_exceptions.DeadlineExceeded,
+    CallDeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
 
-def create_evaluation_prompt(json_data):
+def is_retryable_gemini_error(error):
     """
-    Create a structured prompt for LLM evaluation
+    Classify a Gemini error - invalid keys, bad requests and safety blocks are fatal
     """
-    prompt = f"""You are a recruiting analyst. Given this JSON applicant profile, do four things:
+    return isinstance(error, RETRYABLE_GEMINI_ERRORS)
+
+gemini_policy = CallPolicy(
+    is_retryable=is_retryable_gemini_error,
+    timeout=GEMINI_TIMEOUT,
+    max_retries=GEMINI_MAX_RETRIES,
+    hedge_after=GEMINI_HEDGE_AFTER,
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=60),
+    limiter=GEMINI_LIMITER,
+    max_workers=2 * GEMINI_LIMITER.max_limit  # Room for hedged duplicates
+)
+
+PROMPT_TEMPLATE = """You are a recruiting analyst. Given this JSON applicant profile, do four things:
 
 APPLICANT DATA:
-{json.dumps(json_data, indent=2)}
+{applicant_json}
 
 Please analyze this candidate and provide:
 
@@ -44,51 +88,68 @@ Follow-Ups:
 • [question 2] 
 • [question 3]"""
 
-    return prompt
+# Changes whenever the prompt or generation settings change
+PROMPT_HASH = hashlib.sha256(
+    f"{PROMPT_TEMPLATE}|{GEMINI_TEMPERATURE}|{GEMINI_MAX_OUTPUT_TOKENS}".encode('utf-8')
+).hexdigest()[:12]
+
+# Batch size for LLM result writes (Airtable's per-request limit)
+UPDATE_BATCH_SIZE = 10
+
+def create_evaluation_prompt(applicant):
+    """
+    Create a structured prompt for LLM evaluation
+    """
+    return PROMPT_TEMPLATE.format(applicant_json=format_applicant(applicant))
+
+def llm_version(applicant):
+    """
+    Version stamp for an LLM result: prompt hash, model name and input hash.
+    A stored result is stale when its stamp differs from the current one.
+    """
+    return f"{PROMPT_HASH}/{GEMINI_MODEL}/{fingerprint_applicant(applicant)}"
 
-def call_gemini_api(prompt, retries=0):
+def call_gemini_api(prompt):
     """
-    Make API call to Gemini with retry logic
+    Make API call to Gemini under the deadline/retry/circuit-breaker policy
     """
     if not GEMINI_API_KEY:
         raise Exception("GEMINI_API_KEY not found in environment variables")
     
-    try:
-        # Generate response
+    def generate():
         response = model.generate_content(
             prompt,
             generation_config=genai.types.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=500,
-            )
+                temperature=GEMINI_TEMPERATURE,
+                max_output_tokens=GEMINI_MAX_OUTPUT_TOKENS,
+            ),
+            request_options={'timeout': GEMINI_TIMEOUT}
         )
-        
-        if response.text:
-            return {
-                'success': True,
-                'content': response.text.strip(),
-                'tokens_used': len(response.text.split()) + len(prompt.split())  # Rough estimate
-            }
-        else:
-            return {
-                'success': False,
-                'error': "No response text from Gemini",
-                'content': None
-            }
-        
+        # Raises ValueError when the response was blocked
+        return response.text
+    
+    try:
+        text = gemini_policy.call(generate)
     except Exception as e:
-        if retries < 3:
-            wait_time = (2 ** retries)  # 1s, 2s, 4s
-            print(f"⚠️  API call failed, retrying in {wait_time}s... (attempt {retries + 1}/3)")
-            print(f"   Error: {str(e)}")
-            time.sleep(wait_time)
-            return call_gemini_api(prompt, retries + 1)
-        else:
-            return {
-                'success': False,
-                'error': f"API call failed after 3 retries: {str(e)}",
-                'content': None
-            }
+        kind = "retryable" if is_retryable_gemini_error(e) else "fatal"
+        return {
+            'success': False,
+            'error': f"API call failed ({kind}): {str(e)}",
+            'content': None
+        }
+    
+    if text:
+        return {
+            'success': True,
+            'content': text.strip(),
+            'tokens_used': len(text.split()) + len(prompt.split())  # Rough estimate
+        }
+    else:
+        return {
+            'success': False,
+            'error': "No response text from Gemini",
+            'content': None
+        }
 
 def parse_llm_response(llm_content):
     """
@@ -132,7 +193,7 @@ def parse_llm_response(llm_content):
         }
         
     except Exception as e:
-        print(f"⚠️  Error parsing LLM response: {str(e)}")
+        log.warning(f"⚠️  Error parsing LLM response: {str(e)}")
         return {
             'summary': "Error parsing LLM response",
             'score': 5,
@@ -140,36 +201,35 @@ def parse_llm_response(llm_content):
             'follow_ups': []
         }
 
-def evaluate_applicant_with_gemini(applicant_record):
+def score_applicant(applicant_record, applicant=None):
     """
-    Evaluate a single applicant using Gemini
+    Score a single applicant with Gemini and return the Airtable update, or None
     """
+    applicant_id = applicant_record['fields'].get('Applicant ID')
     try:
-        applicant_id = applicant_record['fields'].get('Applicant ID')
-        compressed_json = applicant_record['fields'].get('Compressed JSON')
-        
-        if not compressed_json:
-            print(f"⚠️  No compressed JSON for {applicant_id}")
-            return False
-        
-        print(f"🤖 Evaluating {applicant_id} with Gemini...")
+        if applicant is None:
+            compressed_json = applicant_record['fields'].get('Compressed JSON')
+            
+            if not compressed_json:
+                log.warning(f"⚠️  No compressed JSON for {applicant_id}")
+                return None
+            
+            # Parse the JSON data
+            try:
+                applicant = decode_applicant(compressed_json)
+            except ApplicantDecodeError as e:
+                log.error(f"❌ Invalid JSON for {applicant_id}: {str(e)}")
+                return None
         
-        # Parse the JSON data
-        try:
-            json_data = json.loads(compressed_json)
-        except json.JSONDecodeError as e:
-            print(f"❌ Invalid JSON for {applicant_id}: {str(e)}")
-            return False
+        log.debug("🤖 Evaluating with Gemini...", extra={'applicant_id': applicant_id})
         
         # Create prompt and call Gemini
-        prompt = create_evaluation_prompt(json_data)
+        prompt = create_evaluation_prompt(applicant)
         llm_result = call_gemini_api(prompt)
         
         if not llm_result['success']:
-            print(f"❌ Gemini API call failed for {applicant_id}: {llm_result['error']}")
-            return False
-        
-        print(f"✅ Gemini response received (~{llm_result['tokens_used']} tokens)")
+            log.error(f"❌ Gemini API call failed for {applicant_id}: {llm_result['error']}")
+            return None
         
         # Parse the LLM response
         parsed_result = parse_llm_response(llm_result['content'])
@@ -177,87 +237,217 @@ def evaluate_applicant_with_gemini(applicant_record):
         # Format follow-ups for Airtable
         follow_ups_text = '\n'.join([f"• {q}" for q in parsed_result['follow_ups']])
         
-        # Update the Applicants table
-        update_data = {
+        log.debug(
+            f"✅ Gemini response received: score {parsed_result['score']}/10, "
+            f"{len(parsed_result['follow_ups'])} follow-ups",
+            extra={'applicant_id': applicant_id, 'tokens': llm_result['tokens_used'],
+                   'summary': parsed_result['summary'][:60]}
+        )
+        
+        return {
             'LLM Summary': parsed_result['summary'],
             'LLM Score': parsed_result['score'],
-            'LLM Follow-Ups': follow_ups_text
+            'LLM Follow-Ups': follow_ups_text,
+            'LLM Version': llm_version(applicant)
         }
         
-        applicants_table.update(applicant_record['id'], update_data)
+    except Exception as e:
+        log.error(f"❌ Error evaluating {applicant_id}: {str(e)}")
+        return None
+
+def evaluate_applicant_with_gemini(applicant_record):
+    """
+    Evaluate a single applicant using Gemini
+    """
+    applicant_id = applicant_record['fields'].get('Applicant ID')
+    update_data = score_applicant(applicant_record)
+    if update_data is None:
+        return False
+    
+    try:
+        run_limited(AIRTABLE_LIMITER, applicants_table.update, applicant_record['id'], update_data)
+        log.info(f"✅ Updated {applicant_id}")
+        applicant = decode_applicant(applicant_record['fields']['Compressed JSON'])
+        record_llm_scores([(applicant_id, applicant, update_data['LLM Score'])])
+        return True
+    except Exception as e:
+        log.error(f"❌ Error updating {applicant_id}: {str(e)}")
+        return False
+
+LLM_FIELDS = ['LLM Summary', 'LLM Score', 'LLM Follow-Ups', 'LLM Version']
+
+def find_stale_applicants(all_applicants, shard=None, current_results=None):
+    """
+    Select applicants whose stored LLM Version differs from the current one.
+    
+    If `current_results` is a dict it is filled with LLM Version -> stored LLM
+    fields for every up-to-date applicant, so exact duplicates (identical
+    profile content) can reuse a result instead of calling Gemini again.
+    """
+    stale = []
+    for record in all_applicants:
+        applicant_id = record['fields'].get('Applicant ID')
+        compressed_json = record['fields'].get('Compressed JSON')
         
-        print(f"✅ Updated {applicant_id}")
-        print(f"   Summary: {parsed_result['summary'][:60]}...")
-        print(f"   Score: {parsed_result['score']}/10")
-        print(f"   Follow-ups: {len(parsed_result['follow_ups'])} questions")
+        if applicant_id and not in_shard(applicant_id, shard):
+            continue
         
-        return True
+        if not applicant_id or not compressed_json:
+            log.warning(f"⚠️  Skipping {applicant_id}: Missing compressed JSON")
+            continue
+        
+        try:
+            applicant = decode_applicant(compressed_json)
+        except ApplicantDecodeError as e:
+            log.error(f"❌ Invalid JSON for {applicant_id}: {str(e)}")
+            continue
         
+        version = llm_version(applicant)
+        if record['fields'].get('LLM Version') != version:
+            stale.append((record, applicant))
+        elif current_results is not None:
+            current_results.setdefault(version, {
+                field: record['fields'].get(field) for field in LLM_FIELDS
+            })
+    return stale
+
+def write_llm_results(pending_updates, pending_scores=()):
+    """
+    Write a batch of LLM results; returns how many were stored.
+    If the batch write fails, each record is retried on its own so one bad
+    record does not discard results Gemini has already returned.
+    Stored scores are then added to the local funnel stats.
+    """
+    try:
+        run_limited(AIRTABLE_LIMITER, applicants_table.batch_update, pending_updates)
+        record_llm_scores(pending_scores)
+        return len(pending_updates)
     except Exception as e:
-        print(f"❌ Error evaluating {applicant_id}: {str(e)}")
-        return False
+        log.warning(f"⚠️  Batch write of {len(pending_updates)} LLM results failed, "
+                    f"retrying per record: {str(e)}")
+    
+    # pending_scores, when given, lines up one-to-one with pending_updates
+    scores = list(pending_scores) or [None] * len(pending_updates)
+    stored = 0
+    stored_scores = []
+    for update, score in zip(pending_updates, scores):
+        try:
+            run_limited(AIRTABLE_LIMITER, applicants_table.update, update['id'], update['fields'])
+        except Exception as e:
+            log.error(f"❌ Error writing LLM result for record {update['id']}: {str(e)}")
+            continue
+        stored += 1
+        if score is not None:
+            stored_scores.append(score)
+    record_llm_scores(stored_scores)
+    return stored
+
+def fetch_applicants():
+    return run_limited(
+        AIRTABLE_LIMITER, applicants_table.all,
+        fields=['Applicant ID', 'Compressed JSON'] + LLM_FIELDS
+    )
 
-def process_all_applicants():
+def process_all_applicants(shard=None, all_applicants=None):
     """
-    Process all applicants that have compressed JSON but no LLM evaluation
+    Process all applicants (or one (index, count) shard) whose LLM evaluation
+    is missing or stale for the current prompt, model or profile data.
+    Returns True if every stale applicant was scored and written.
     """
     try:
-        print("=== Gemini LLM Evaluation & Enrichment ===")
+        log.info("=== Gemini LLM Evaluation & Enrichment ===")
         
-        # Get all applicants
-        all_applicants = applicants_table.all()
+        if all_applicants is None:
+            all_applicants = fetch_applicants()
+        current_results = {}
+        stale = find_stale_applicants(all_applicants, shard, current_results)
+        log.info(f"Found {len(stale)} of {len(all_applicants)} applicants needing evaluation")
+        
+        # Group exact duplicates (same LLM Version) so each is scored once
+        groups = {}
+        for record, applicant in stale:
+            groups.setdefault(llm_version(applicant), []).append((record, applicant))
         
         processed = 0
+        reused = 0
+        pending_updates = []
+        pending_scores = []
         
-        for applicant in all_applicants:
-            applicant_id = applicant['fields'].get('Applicant ID')
-            compressed_json = applicant['fields'].get('Compressed JSON')
-            existing_summary = applicant['fields'].get('LLM Summary')
-            
-            # Skip if no data or already processed
-            if not applicant_id or not compressed_json:
-                print(f"⚠️  Skipping {applicant_id}: Missing compressed JSON")
-                continue
-                
-            if existing_summary:
-                print(f"⚠️  Skipping {applicant_id}: Already has LLM evaluation")
-                continue
-            
-            # Process with Gemini
-            if evaluate_applicant_with_gemini(applicant):
-                processed += 1
-                
-            # Small delay to be respectful to the API
-            time.sleep(2)
+        def queue_result(records, update_data, scored_first):
+            nonlocal processed, reused, pending_updates, pending_scores
+            for position, (record, applicant) in enumerate(records):
+                applicant_id = record['fields'].get('Applicant ID')
+                if position or not scored_first:
+                    log.debug("♻️  Reusing LLM result for duplicate", extra={'applicant_id': applicant_id})
+                    reused += 1
+                pending_updates.append({'id': record['id'], 'fields': update_data})
+                pending_scores.append((applicant_id, applicant, update_data.get('LLM Score')))
+                if len(pending_updates) >= UPDATE_BATCH_SIZE:
+                    processed += write_llm_results(pending_updates, pending_scores)
+                    pending_updates = []
+                    pending_scores = []
         
-        print(f"\n=== Gemini Processing Complete ===")
-        print(f"Processed: {processed} applicants")
+        # Exact duplicates of applicants already scored with this prompt and model
+        to_score = {}
+        for version, records in groups.items():
+            if version in current_results:
+                queue_result(records, current_results[version], scored_first=False)
+            else:
+                to_score[version] = records
+        
+        # Score the rest concurrently; the adaptive limiter inside the call
+        # policy decides how many Gemini requests are actually in flight
+        progress = Progress(log, "Gemini scoring", len(to_score))
+        with ThreadPoolExecutor(max_workers=GEMINI_LIMITER.max_limit) as executor:
+            futures = {
+                executor.submit(score_applicant, *records[0]): version
+                for version, records in to_score.items()
+            }
+            for future in as_completed(futures):
+                update_data = future.result()
+                if update_data is not None:
+                    queue_result(to_score[futures[future]], update_data, scored_first=True)
+                if progress.update(failed=int(update_data is None)):
+                    print_limiter_metrics(GEMINI_LIMITER, AIRTABLE_LIMITER)
+        
+        if pending_updates:
+            processed += write_llm_results(pending_updates, pending_scores)
+        progress.finish()
+        
+        log.info("=== Gemini Processing Complete ===")
+        log.info(f"Processed: {processed} applicants ({reused} reused from duplicates)")
+        print_limiter_metrics(GEMINI_LIMITER, AIRTABLE_LIMITER)
+        return processed == len(stale)
         
     except Exception as e:
-        print(f"❌ Error in Gemini processing: {str(e)}")
+        log.error(f"❌ Error in Gemini processing: {str(e)}")
+        return False
 
 def process_specific_applicant(applicant_id):
     """
     Process a specific applicant by ID
     """
     try:
-        applicants = applicants_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
+        applicants = run_limited(AIRTABLE_LIMITER, applicants_table.all,
+                                 formula=f"{{Applicant ID}} = '{applicant_id}'")
         if not applicants:
-            print(f"❌ Applicant {applicant_id} not found")
+            log.error(f"❌ Applicant {applicant_id} not found")
             return
             
         evaluate_applicant_with_gemini(applicants[0])
         
     except Exception as e:
-        print(f"❌ Error processing {applicant_id}: {str(e)}")
+        log.error(f"❌ Error processing {applicant_id}: {str(e)}")
 
 if __name__ == "__main__":
-    print("=== Gemini LLM Evaluation Script ===")
+    setup_logging_from_argv("Score applicants with Gemini")
+    http_replay.install()
+    log.info("=== Gemini LLM Evaluation Script ===")
     
     # Check if API key is configured
     if not GEMINI_API_KEY:
-        print("❌ Please add GEMINI_API_KEY to your .env file")
-        print("   Get your API key from: https://aistudio.google.com/app/apikey")
+        log.error("❌ Please add GEMINI_API_KEY to your .env file")
+        log.error("   Get your API key from: https://aistudio.google.com/app/apikey")
         exit(1)
     
     # Option 1: Process all applicants
@@ -0,0 +1,285 @@
+import os
+import json
+import gzip
+import time
+import atexit
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter, deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import httpx
+from dotenv import load_dotenv
+# Imported first so its exit handler runs after ours and the summary is flushed
+import structured_logging  # noqa: F401
+
+# Load environment variables
+load_dotenv()
+
+# HTTP_REPLAY_MODE: 'off', 'record' (real calls, logged) or 'replay' (no network)
+HTTP_REPLAY_MODE = os.getenv('HTTP_REPLAY_MODE', 'off')
+HTTP_REPLAY_PATH = os.getenv('HTTP_REPLAY_PATH', 'http_replay.jsonl.gz')
+# Replayed latency = recorded latency * speed (0 = answer immediately)
+HTTP_REPLAY_SPEED = float(os.getenv('HTTP_REPLAY_SPEED', '1.0'))
+
+LOG_VERSION = 1
+# Only headers the scripts read are kept; bodies are stored decoded
+KEPT_HEADERS = {'content-type', 'retry-after'}
+# Query parameters that carry credentials are never written to the log
+SECRET_PARAMS = {'key', 'api_key'}
+
+log = logging.getLogger('http_replay')
+
+class ReplayMiss(Exception):
+    """
+    Raised in replay mode for a request that has no recorded exchange left
+    """
+
+def normalize_url(url):
+    parts = urlsplit(str(url))
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if k not in SECRET_PARAMS])
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+def body_hash(body):
+    if not body:
+        return ''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+class ExchangeLog:
+    """
+    Recorded HTTP exchanges, one gzipped JSON object per line.
+
+    In replay mode each exchange is served once. Requests are matched on
+    method, URL and body first; if the body differs (e.g. a write containing
+    a fresh timestamp) the next unused exchange for the same method and URL
+    is served instead, so replays follow the recorded order per endpoint.
+    """
+
+    def __init__(self, path, mode, speed=HTTP_REPLAY_SPEED):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self.served = Counter()
+        self.misses = Counter()
+        self.loose_matches = 0
+        self._file = None
+        self._entries = []
+        self._by_exact = {}
+        self._by_route = {}
+        self._used = set()
+
+        if mode == 'record':
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+            self._file.write(json.dumps({'version': LOG_VERSION, 'recorded_at': time.time()}) + '\n')
+        elif mode == 'replay':
+            for position, entry in enumerate(read_log(path)):
+                self._entries.append(entry)
+                route = (entry['method'], entry['url'])
+                self._by_exact.setdefault(route + (entry['body_hash'],), deque()).append(position)
+                self._by_route.setdefault(route, deque()).append(position)
+        else:
+            raise ValueError(f"Unknown HTTP replay mode: {mode}")
+
+    def record(self, method, url, request_body, status, headers, body, latency):
+        entry = {
+            'method': method,
+            'url': normalize_url(url),
+            'body_hash': body_hash(request_body),
+            'status': status,
+            'headers': {k.lower(): v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            'body': body.decode('utf-8', 'surrogateescape'),
+            'latency': round(latency, 4),
+        }
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self.served[urlsplit(entry['url']).netloc] += 1
+
+    def _next(self, queue):
+        while queue and queue[0] in self._used:
+            queue.popleft()
+        return queue.popleft() if queue else None
+
+    def lookup(self, method, url, request_body):
+        """
+        The recorded exchange for this request, consumed; raises ReplayMiss
+        """
+        url = normalize_url(url)
+        route = (method, url)
+        with self._lock:
+            position = self._next(self._by_exact.get(route + (body_hash(request_body),), deque()))
+            if position is None:
+                position = self._next(self._by_route.get(route, deque()))
+                if position is not None:
+                    self.loose_matches += 1
+            if position is None:
+                self.misses[urlsplit(url).netloc] += 1
+                raise ReplayMiss(f"No recorded exchange left for {method} {url}")
+            self._used.add(position)
+            self.served[urlsplit(url).netloc] += 1
+        entry = self._entries[position]
+        return entry, entry['body'].encode('utf-8', 'surrogateescape')
+
+    def delay(self, entry):
+        return entry['latency'] * self.speed
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def summary(self):
+        verb = "Recorded" if self.mode == 'record' else "Replayed"
+        hosts = ', '.join(f"{host} {count}" for host, count in self.served.most_common()) or 'none'
+        line = f"🎞️  {verb} {sum(self.served.values())} HTTP exchanges ({hosts})"
+        if self.mode == 'replay':
+            unused = len(self._entries) - len(self._used)
+            line += (f", {sum(self.misses.values())} misses, {self.loose_matches} matched "
+                     f"without request body, {unused} unused")
+        return line
+
+def read_log(path):
+    """
+    Yield the exchanges of a log file, checking its version header
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('version') != LOG_VERSION:
+            raise ValueError(f"{path} is not an HTTP replay log (version {LOG_VERSION})")
+        for line in f:
+            yield json.loads(line)
+
+_exchange_log = None
+_original_send = HTTPAdapter.send
+
+def _replaying_send(adapter, request, **kwargs):
+    """
+    HTTPAdapter.send replacement covering every requests-based client
+    (pyairtable, and Gemini when it uses the REST transport)
+    """
+    exchange_log = _exchange_log
+    if exchange_log.mode == 'record':
+        start = time.monotonic()
+        response = _original_send(adapter, request, **kwargs)
+        content = response.content  # Read the body so latency covers the whole exchange
+        exchange_log.record(request.method, request.url, request.body, response.status_code,
+                            response.headers, content, time.monotonic() - start)
+        return response
+
+    entry, content = exchange_log.lookup(request.method, request.url, request.body)
+    time.sleep(exchange_log.delay(entry))
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = content
+    response.encoding = 'utf-8'
+    response.url = request.url
+    response.request = request
+    response.reason = ''
+    response.connection = adapter
+    return response
+
+class ReplayAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport for AsyncAirtable that records or replays exchanges
+    """
+
+    def __init__(self, exchange_log):
+        self.exchange_log = exchange_log
+        self.inner = httpx.AsyncHTTPTransport() if exchange_log.mode == 'record' else None
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        if self.exchange_log.mode == 'record':
+            start = time.monotonic()
+            response = await self.inner.handle_async_request(request)
+            content = await response.aread()
+            self.exchange_log.record(request.method, request.url, body, response.status_code,
+                                     response.headers, content, time.monotonic() - start)
+            headers = {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+            return httpx.Response(response.status_code, headers=headers, content=content)
+
+        entry, content = self.exchange_log.lookup(request.method, request.url, body)
+        await asyncio.sleep(self.exchange_log.delay(entry))
+        return httpx.Response(entry['status'], headers=entry['headers'], content=content)
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+def async_transport():
+    """
+    Transport for httpx clients: None (default transport) unless recording or replaying
+    """
+    return ReplayAsyncTransport(_exchange_log) if _exchange_log else None
+
+def is_active():
+    return HTTP_REPLAY_MODE != 'off'
+
+def install(mode=HTTP_REPLAY_MODE, path=HTTP_REPLAY_PATH, speed=HTTP_REPLAY_SPEED):
+    """
+    Start recording or replaying every HTTP exchange of this process
+    """
+    global _exchange_log
+    if mode == 'off':
+        return None
+    uninstall()
+    _exchange_log = ExchangeLog(path, mode, speed)
+    HTTPAdapter.send = _replaying_send
+    log.info(f"🎞️  HTTP {mode} mode: {path}" + (f" (latency x{speed})" if mode == 'replay' else ""))
+    return _exchange_log
+
+def uninstall():
+    """
+    Restore real HTTP and close the log, printing what was recorded/replayed
+    """
+    global _exchange_log
+    HTTPAdapter.send = _original_send
+    if _exchange_log is not None:
+        _exchange_log.close()
+        log.info(_exchange_log.summary())
+        _exchange_log = None
+
+atexit.register(uninstall)
+
+def print_log_stats(path):
+    """
+    Round trips and recorded latency per host, method and Airtable table
+    """
+    try:
+        calls = Counter()
+        latency = Counter()
+        for entry in read_log(path):
+            parts = urlsplit(entry['url'])
+            segments = parts.path.strip('/').split('/')
+            # /v0/<base>/<table>[/<record>] for Airtable, /<version>/models/... for Gemini
+            target = segments[2] if parts.netloc == 'api.airtable.com' and len(segments) > 2 else segments[-1]
+            key = (parts.netloc, entry['method'], unquote(target))
+            calls[key] += 1
+            latency[key] += entry['latency']
+
+        print(f"=== HTTP Replay Log: {path} ===")
+        for (host, method, target), count in calls.most_common():
+            total = latency[(host, method, target)]
+            print(f"  {host} {method} {target}: {count} calls, {total:.1f}s recorded "
+                  f"({1000 * total / count:.0f}ms avg)")
+        print(f"Total: {sum(calls.values())} round trips, {sum(latency.values()):.1f}s of API latency")
+
+    except Exception as e:
+        print(f"❌ Error reading replay log: {str(e)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a recorded HTTP replay log")
+    parser.add_argument('path', nargs='?', default=HTTP_REPLAY_PATH)
+    args = parser.parse_args()
+
+    print_log_stats(args.path)
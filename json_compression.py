@@ -1,14 +1,23 @@
 import os
-import json
+import asyncio
+import logging
 from pyairtable import Api
 from dotenv import load_dotenv
 from datetime import datetime
+from applicant_model import Applicant, Personal, Experience, Salary, encode_applicant, format_applicant
+from worker_shards import in_shard
+from airtable_async import AsyncAirtable
+from adaptive_concurrency import AIRTABLE_LIMITER, run_limited
+from similar_candidates import SimilarityIndex
+from structured_logging import Progress, setup_logging_from_argv
+import http_replay
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Airtable API
-api = Api(os.getenv('AIRTABLE_API_TOKEN'))
+# Initialize Airtable API; 429s are retried by run_limited so the
+# adaptive limiter sees them, rather than inside the requests session
+api = Api(os.getenv('AIRTABLE_API_TOKEN'), retry_strategy=False)
 base = api.base(os.getenv('AIRTABLE_BASE_ID'))
 
 # Table references
@@ -17,108 +26,221 @@ personal_table = base.table('Personal Details')
 work_table = base.table('Work Experience')
 salary_table = base.table('Salary Preferences')
 
+log = logging.getLogger('json_compression')
+
+# Local "find similar candidates" index, updated whenever new JSON is produced
+_similarity_index = None
+
+def update_similarity_index(applicant_id, applicant):
+    global _similarity_index
+    try:
+        if _similarity_index is None:
+            _similarity_index = SimilarityIndex()
+        _similarity_index.upsert(applicant_id, applicant)
+    except Exception as e:
+        log.warning(f"⚠️  Could not update similarity index: {str(e)}", extra={'applicant_id': applicant_id})
+
+def applicant_formula(applicant_id):
+    return f"{{Applicant ID}} = '{applicant_id}'"
+
+def build_applicant(personal_records, work_records, salary_records):
+    """
+    Build the compressed Applicant from its linked-table records
+    """
+    # Personal details (one-to-one)
+    personal_data = Personal()
+    if personal_records:
+        record = personal_records[0]['fields']
+        personal_data = Personal(
+            name=record.get('Full Name', ''),
+            email=record.get('Email', ''),
+            location=record.get('Location', ''),
+            linkedin=record.get('LinkedIn', '')
+        )
+    
+    # Work experience (multiple records possible)
+    experience_data = []
+    for record in work_records:
+        fields = record['fields']
+        exp_entry = Experience(
+            company=fields.get('Company', ''),
+            title=fields.get('Title', ''),
+            start=fields.get('Start', ''),
+            end=fields.get('End', ''),
+            technologies=fields.get('Technologies', '')
+        )
+        experience_data.append(exp_entry)
+    
+    # Salary preferences (one-to-one)
+    salary_data = Salary()
+    if salary_records:
+        record = salary_records[0]['fields']
+        # Try different possible field names for availability
+        availability = (record.get('Availability (hrs/wk)', 0) or
+                      record.get('Availability', 0))
+        
+        salary_data = Salary(
+            preferred_rate=record.get('Preferred Rate', 0),
+            minimum_rate=record.get('Minimum Rate', 0),
+            currency=record.get('Currency', 'USD'),
+            availability=availability
+        )
+    
+    return Applicant(
+        personal=personal_data,
+        experience=experience_data,
+        salary=salary_data,
+        compressed_at=datetime.now().isoformat()
+    )
+
 def compress_applicant_data(applicant_id):
     """
     Compress data from linked tables into a single JSON object
     """
     try:
-        print(f"Processing applicant: {applicant_id}")
+        log.debug("Processing applicant", extra={'applicant_id': applicant_id})
         
-        # Get personal details
-        personal_records = personal_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
-        personal_data = {}
-        if personal_records:
-            record = personal_records[0]['fields']
-            personal_data = {
-                "name": record.get('Full Name', ''),
-                "email": record.get('Email', ''),
-                "location": record.get('Location', ''),
-                "linkedin": record.get('LinkedIn', '')
-            }
+        formula = applicant_formula(applicant_id)
+        applicant = build_applicant(
+            run_limited(AIRTABLE_LIMITER, personal_table.all, formula=formula),
+            run_limited(AIRTABLE_LIMITER, work_table.all, formula=formula),
+            run_limited(AIRTABLE_LIMITER, salary_table.all, formula=formula)
+        )
         
-        # Get work experience (multiple records possible)
-        work_records = work_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
-        experience_data = []
-        for record in work_records:
-            fields = record['fields']
-            exp_entry = {
-                "company": fields.get('Company', ''),
-                "title": fields.get('Title', ''),
-                "start": fields.get('Start', ''),
-                "end": fields.get('End', ''),
-                "technologies": fields.get('Technologies', '')
-            }
-            experience_data.append(exp_entry)
-        
-        # Get salary preferences
-        salary_records = salary_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
-        salary_data = {}
-        if salary_records:
-            record = salary_records[0]['fields']
-            # Try different possible field names for availability
-            availability = (record.get('Availability (hrs/wk)', 0) or
-                          record.get('Availability', 0))
-            
-            salary_data = {
-                "preferred_rate": record.get('Preferred Rate', 0),
-                "minimum_rate": record.get('Minimum Rate', 0),
-                "currency": record.get('Currency', 'USD'),
-                "availability": availability
-            }
-        
-        # Create compressed JSON
-        compressed_data = {
-            "personal": personal_data,
-            "experience": experience_data,
-            "salary": salary_data,
-            "compressed_at": datetime.now().isoformat()
-        }
-        
-        # Convert to JSON string
-        json_string = json.dumps(compressed_data, indent=2)
+        # Convert to compact JSON string
+        json_string = encode_applicant(applicant)
         
         # Update the Applicants table with compressed JSON
-        applicant_records = applicants_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
+        applicant_records = run_limited(AIRTABLE_LIMITER, applicants_table.all, formula=formula)
         if applicant_records:
             record_id = applicant_records[0]['id']
-            applicants_table.update(record_id, {
+            run_limited(AIRTABLE_LIMITER, applicants_table.update, record_id, {
                 'Compressed JSON': json_string
             })
-            print(f"✅ Successfully compressed data for {applicant_id}")
-            print(f"JSON Preview:\n{json_string}")
+            update_similarity_index(applicant_id, applicant)
+            log.debug("✅ Successfully compressed data", extra={'applicant_id': applicant_id})
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"JSON Preview:\n{format_applicant(applicant)}", extra={'applicant_id': applicant_id})
         else:
-            print(f"❌ No applicant found with ID: {applicant_id}")
+            log.error(f"❌ No applicant found with ID: {applicant_id}")
             
         return json_string
         
     except Exception as e:
-        print(f"❌ Error compressing data for {applicant_id}: {str(e)}")
+        log.error(f"❌ Error compressing data: {str(e)}", extra={'applicant_id': applicant_id})
         return None
 
-def compress_all_applicants():
+async def compress_applicant_data_async(client, applicant_id, applicant_record_id=None):
     """
-    Compress data for all applicants in the system
+    Async variant of compress_applicant_data: the child-table reads run
+    concurrently, so the critical path is one read round trip plus the write
     """
     try:
-        # Get all applicants
-        all_applicants = applicants_table.all()
-        print(f"Found {len(all_applicants)} applicants to process")
+        formula = applicant_formula(applicant_id)
+        reads = [
+            client.all('Personal Details', formula=formula),
+            client.all('Work Experience', formula=formula),
+            client.all('Salary Preferences', formula=formula),
+        ]
+        if applicant_record_id is None:
+            reads.append(client.all('Applicants', formula=formula, fields=['Applicant ID']))
+        results = await asyncio.gather(*reads)
         
+        if applicant_record_id is None:
+            if not results[3]:
+                log.error(f"❌ No applicant found with ID: {applicant_id}")
+                return None
+            applicant_record_id = results[3][0]['id']
+        
+        applicant = build_applicant(*results[:3])
+        json_string = encode_applicant(applicant)
+        await client.update('Applicants', applicant_record_id, {
+            'Compressed JSON': json_string
+        })
+        update_similarity_index(applicant_id, applicant)
+        log.debug("✅ Successfully compressed data", extra={'applicant_id': applicant_id})
+        return json_string
+        
+    except Exception as e:
+        log.error(f"❌ Error compressing data: {str(e)}", extra={'applicant_id': applicant_id})
+        return None
+
+def fetch_applicants():
+    return run_limited(AIRTABLE_LIMITER, applicants_table.all, fields=['Applicant ID'])
+
+def compress_all_applicants(shard=None, all_applicants=None):
+    """
+    Compress data for all applicants in the system (or one (index, count) shard).
+    Returns True if every applicant was compressed.
+    """
+    try:
+        # Get all applicants, unless a worker already fetched them
+        if all_applicants is None:
+            all_applicants = fetch_applicants()
+        log.info(f"Found {len(all_applicants)} applicants to process")
+        failed = 0
+        
+        progress = Progress(log, "Compression", len(all_applicants))
         for applicant in all_applicants:
             applicant_id = applicant['fields'].get('Applicant ID')
+            if applicant_id and not in_shard(applicant_id, shard):
+                progress.update(skipped=1)
+                continue
             if applicant_id:
-                compress_applicant_data(applicant_id)
+                compressed = compress_applicant_data(applicant_id)
+                failed += 0 if compressed else 1
+                progress.update(failed=0 if compressed else 1)
             else:
-                print(f"⚠️  Skipping applicant with missing ID: {applicant['id']}")
+                log.warning(f"⚠️  Skipping applicant with missing ID: {applicant['id']}")
+                progress.update(skipped=1)
+        progress.finish()
+        return failed == 0
                 
     except Exception as e:
-        print(f"❌ Error processing all applicants: {str(e)}")
+        log.error(f"❌ Error processing all applicants: {str(e)}")
+        return False
+
+async def compress_all_applicants_async(shard=None):
+    """
+    Compress all applicants concurrently under the shared Airtable rate limit
+    """
+    try:
+        async with AsyncAirtable(os.getenv('AIRTABLE_API_TOKEN'), os.getenv('AIRTABLE_BASE_ID')) as client:
+            all_applicants = await client.all('Applicants', fields=['Applicant ID'])
+            log.info(f"Found {len(all_applicants)} applicants to process")
+            
+            tasks = []
+            for applicant in all_applicants:
+                applicant_id = applicant['fields'].get('Applicant ID')
+                if not applicant_id:
+                    log.warning(f"⚠️  Skipping applicant with missing ID: {applicant['id']}")
+                elif in_shard(applicant_id, shard):
+                    tasks.append(compress_applicant_data_async(client, applicant_id, applicant['id']))
+            
+            progress = Progress(log, "Compression", len(tasks))
+            compressed = 0
+            for task in asyncio.as_completed(tasks):
+                if await task:
+                    compressed += 1
+                    progress.update()
+                else:
+                    progress.update(failed=1)
+            progress.finish()
+            log.info(f"✅ Compressed {compressed} of {len(tasks)} applicants")
+            
+    except Exception as e:
+        log.error(f"❌ Error processing all applicants: {str(e)}")
 
 if __name__ == "__main__":
-    print("=== JSON Compression Script ===")
+    setup_logging_from_argv("Compress linked-table data into Compressed JSON")
+    http_replay.install()
+    log.info("=== JSON Compression Script ===")
     
     # Option 1: Compress specific applicant
     # compress_applicant_data("APP001")
     
     # Option 2: Compress all applicants
-    compress_all_applicants()
\ No newline at end of file
+    compress_all_applicants()
+    
+    # Option 3: Compress all applicants concurrently (async client)
+    # asyncio.run(compress_all_applicants_async())
\ No newline at end of file
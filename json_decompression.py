@@ -1,7 +1,9 @@
 import os
-import json
+import asyncio
 from pyairtable import Api
 from dotenv import load_dotenv
+from applicant_model import Personal, Salary, decode_applicant, ApplicantDecodeError
+from airtable_async import AsyncAirtable
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +18,34 @@ personal_table = base.table('Personal Details')
 work_table = base.table('Work Experience')
 salary_table = base.table('Salary Preferences')
 
+def build_personal_fields(personal_data, applicant_record_id):
+    return {
+        'Full Name': personal_data.name,
+        'Email': personal_data.email,
+        'Location': personal_data.location,
+        'LinkedIn': personal_data.linkedin,
+        'Applicant ID': [applicant_record_id]  # Link to applicant
+    }
+
+def build_work_fields(exp, applicant_record_id):
+    return {
+        'Company': exp.company,
+        'Title': exp.title,
+        'Start': exp.start,
+        'End': exp.end,
+        'Technologies': exp.technologies,
+        'Applicant ID': [applicant_record_id]  # Link to applicant
+    }
+
+def build_salary_fields(salary_data, applicant_record_id):
+    return {
+        'Preferred Rate': salary_data.preferred_rate,
+        'Minimum Rate': salary_data.minimum_rate,
+        'Currency': salary_data.currency,
+        'Availability (hrs/wk)': salary_data.availability,
+        'Applicant ID': [applicant_record_id]  # Link to applicant
+    }
+
 def decompress_applicant_data(applicant_id):
     """
     Decompress JSON data back into normalized tables
@@ -38,8 +68,8 @@ def decompress_applicant_data(applicant_id):
         
         # Parse the JSON
         try:
-            data = json.loads(compressed_json)
-        except json.JSONDecodeError as e:
+            data = decode_applicant(compressed_json)
+        except ApplicantDecodeError as e:
             print(f"❌ Invalid JSON format: {str(e)}")
             return False
         
@@ -47,18 +77,12 @@ def decompress_applicant_data(applicant_id):
         applicant_record_id = applicant_record['id']
         
         # 1. Update/Create Personal Details
-        if data.get('personal'):
-            personal_data = data['personal']
+        if data.personal != Personal():
+            personal_data = data.personal
             # Check if personal record exists
             existing_personal = personal_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
             
-            personal_fields = {
-                'Full Name': personal_data.get('name', ''),
-                'Email': personal_data.get('email', ''),
-                'Location': personal_data.get('location', ''),
-                'LinkedIn': personal_data.get('linkedin', ''),
-                'Applicant ID': [applicant_record_id]  # Link to applicant
-            }
+            personal_fields = build_personal_fields(personal_data, applicant_record_id)
             
             if existing_personal:
                 # Update existing record
@@ -70,28 +94,21 @@ def decompress_applicant_data(applicant_id):
                 print("✅ Created personal details")
         
         # 2. Update/Create Work Experience
-        if data.get('experience'):
+        if data.experience:
             # First, delete existing work experience records
             existing_work = work_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
             for record in existing_work:
                 work_table.delete(record['id'])
             
             # Create new work experience records
-            for exp in data['experience']:
-                work_fields = {
-                    'Company': exp.get('company', ''),
-                    'Title': exp.get('title', ''),
-                    'Start': exp.get('start', ''),
-                    'End': exp.get('end', ''),
-                    'Technologies': exp.get('technologies', ''),
-                    'Applicant ID': [applicant_record_id]  # Link to applicant
-                }
+            for exp in data.experience:
+                work_fields = build_work_fields(exp, applicant_record_id)
                 work_table.create(work_fields)
-            print(f"✅ Created {len(data['experience'])} work experience records")
+            print(f"✅ Created {len(data.experience)} work experience records")
         
         # 3. Update/Create Salary Preferences
-        if data.get('salary'):
-            salary_data = data['salary']
+        if data.salary != Salary():
+            salary_data = data.salary
             # Check if salary record exists
             existing_salary = salary_table.all(formula=f"{{Applicant ID}} = '{applicant_id}'")
             
@@ -104,13 +121,7 @@ def decompress_applicant_data(applicant_id):
             except:
                 pass
             
-            salary_fields = {
-                'Preferred Rate': salary_data.get('preferred_rate', 0),
-                'Minimum Rate': salary_data.get('minimum_rate', 0),
-                'Currency': salary_data.get('currency', 'USD'),
-                'Availability (hrs/wk)': salary_data.get('availability', 0),
-                'Applicant ID': [applicant_record_id]  # Link to applicant
-            }
+            salary_fields = build_salary_fields(salary_data, applicant_record_id)
             
             if existing_salary:
                 # Update existing record
@@ -128,6 +139,61 @@ def decompress_applicant_data(applicant_id):
         print(f"❌ Error decompressing data for {applicant_id}: {str(e)}")
         return False
 
+async def decompress_applicant_data_async(client, applicant_id, applicant_record):
+    """
+    Async variant of decompress_applicant_data for an already-fetched applicant
+    record: the child-table lookups run concurrently, then the independent
+    per-table writes run concurrently
+    """
+    try:
+        try:
+            data = decode_applicant(applicant_record['fields']['Compressed JSON'])
+        except ApplicantDecodeError as e:
+            print(f"❌ Invalid JSON format for {applicant_id}: {str(e)}")
+            return False
+        
+        applicant_record_id = applicant_record['id']
+        formula = f"{{Applicant ID}} = '{applicant_id}'"
+        existing_personal, existing_work, existing_salary = await asyncio.gather(
+            client.all('Personal Details', formula=formula, fields=['Full Name']),
+            client.all('Work Experience', formula=formula, fields=['Company']),
+            client.all('Salary Preferences', formula=formula, fields=['Currency'])
+        )
+        
+        async def write_one_to_one(table_name, existing, fields):
+            if existing:
+                await client.update(table_name, existing[0]['id'], fields)
+            else:
+                await client.create(table_name, fields)
+        
+        async def replace_work():
+            await client.batch_delete('Work Experience', [r['id'] for r in existing_work])
+            await client.batch_create('Work Experience', [
+                build_work_fields(exp, applicant_record_id) for exp in data.experience
+            ])
+        
+        writes = []
+        if data.personal != Personal():
+            writes.append(write_one_to_one(
+                'Personal Details', existing_personal,
+                build_personal_fields(data.personal, applicant_record_id)
+            ))
+        if data.experience:
+            writes.append(replace_work())
+        if data.salary != Salary():
+            writes.append(write_one_to_one(
+                'Salary Preferences', existing_salary,
+                build_salary_fields(data.salary, applicant_record_id)
+            ))
+        await asyncio.gather(*writes)
+        
+        print(f"✅ Successfully decompressed data for {applicant_id}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error decompressing data for {applicant_id}: {str(e)}")
+        return False
+
 def decompress_all_applicants():
     """
     Decompress data for all applicants that have compressed JSON
@@ -152,6 +218,30 @@ def decompress_all_applicants():
     except Exception as e:
         print(f"❌ Error processing all applicants: {str(e)}")
 
+async def decompress_all_applicants_async():
+    """
+    Decompress all applicants concurrently under the shared Airtable rate limit
+    """
+    try:
+        async with AsyncAirtable(os.getenv('AIRTABLE_API_TOKEN'), os.getenv('AIRTABLE_BASE_ID')) as client:
+            all_applicants = await client.all(
+                'Applicants', fields=['Applicant ID', 'Compressed JSON']
+            )
+            
+            tasks = []
+            for applicant in all_applicants:
+                applicant_id = applicant['fields'].get('Applicant ID')
+                if applicant_id and applicant['fields'].get('Compressed JSON'):
+                    tasks.append(decompress_applicant_data_async(client, applicant_id, applicant))
+                else:
+                    print(f"⚠️  Skipping applicant {applicant_id}: No compressed JSON")
+            
+            results = await asyncio.gather(*tasks)
+            print(f"✅ Processed {sum(results)} applicants")
+            
+    except Exception as e:
+        print(f"❌ Error processing all applicants: {str(e)}")
+
 if __name__ == "__main__":
     print("=== JSON Decompression Script ===")
     
@@ -159,4 +249,7 @@ if __name__ == "__main__":
     # decompress_applicant_data("APP001")
     
     # Option 2: Decompress all applicants
-    decompress_all_applicants()
\ No newline at end of file
+    decompress_all_applicants()
+    
+    # Option 3: Decompress all applicants concurrently (async client)
+    # asyncio.run(decompress_all_applicants_async())
\ No newline at end of file
@@ -12,7 +12,10 @@ applicants_table = base.table('Applicants')
 
 def reset_llm_fields():
     """
-    Reset all LLM fields to empty for all applicants
+    Reset all LLM fields to empty for all applicants.
+    
+    Not needed for re-scoring: gemini_llm_evaluation re-evaluates any
+    applicant whose LLM Version is stale.
     """
     try:
         print("=== Resetting LLM Fields ===")
@@ -35,7 +38,8 @@ def reset_llm_fields():
                 update_data = {
                     'LLM Summary': None,
                     'LLM Score': None,
-                    'LLM Follow-Ups': None
+                    'LLM Follow-Ups': None,
+                    'LLM Version': None
                 }
                 
                 applicants_table.update(applicant['id'], update_data)
@@ -65,7 +69,8 @@ def reset_specific_applicant(applicant_id):
         update_data = {
             'LLM Summary': None,
             'LLM Score': None,
-            'LLM Follow-Ups': None
+            'LLM Follow-Ups': None,
+            'LLM Version': None
         }
         
         applicants_table.update(applicant['id'], update_data)
@@ -1,20 +1,29 @@
 import os
-import json
+import logging
 from pyairtable import Api
 from dotenv import load_dotenv
 from datetime import datetime, date
+from applicant_model import decode_applicant
+from worker_shards import in_shard
+from adaptive_concurrency import AIRTABLE_LIMITER, run_limited
+from structured_logging import Progress, setup_logging_from_argv
+from funnel_stats import record_shortlist_outcomes
+import http_replay
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Airtable API
-api = Api(os.getenv('AIRTABLE_API_TOKEN'))
+# Initialize Airtable API; 429s are retried by run_limited so the
+# adaptive limiter sees them, rather than inside the requests session
+api = Api(os.getenv('AIRTABLE_API_TOKEN'), retry_strategy=False)
 base = api.base(os.getenv('AIRTABLE_BASE_ID'))
 
 # Table references
 applicants_table = base.table('Applicants')
 shortlisted_table = base.table('Shortlisted Leads')
 
+log = logging.getLogger('shortlist_automation')
+
 # Shortlist criteria constants
 TIER_1_COMPANIES = [
     'Google', 'Meta', 'OpenAI', 'Microsoft', 'Apple', 'Amazon', 
@@ -29,6 +38,13 @@ ACCEPTED_LOCATIONS = [
     'Delhi', 'Bangalore', 'Hyderabad'
 ]
 
+# Upsert settings - Airtable applies each request of up to 10 records atomically
+UPSERT_BATCH_SIZE = 10
+MERGE_FIELDS = ['Applicant ID']
+
+# Outcomes are added to the local funnel stats in batches of this size
+STATS_BATCH_SIZE = 500
+
 def calculate_experience_years(experience_data):
     """
     Calculate total years of experience from work history
@@ -36,8 +52,8 @@ def calculate_experience_years(experience_data):
     total_years = 0
     
     for exp in experience_data:
-        start_str = exp.get('start', '')
-        end_str = exp.get('end', '')
+        start_str = exp.start
+        end_str = exp.end
         
         if not start_str:
             continue
@@ -57,7 +73,7 @@ def calculate_experience_years(experience_data):
             total_years += years
             
         except ValueError as e:
-            print(f"⚠️  Error parsing dates for {exp.get('company', 'Unknown')}: {e}")
+            log.warning(f"⚠️  Error parsing dates for {exp.company or 'Unknown'}: {e}")
             continue
     
     return round(total_years, 1)
@@ -67,7 +83,7 @@ def has_tier1_experience(experience_data):
     Check if candidate has worked at a Tier-1 company
     """
     for exp in experience_data:
-        company = exp.get('company', '').strip()
+        company = exp.company.strip()
         if company in TIER_1_COMPANIES:
             return True, company
     return False, None
@@ -90,7 +106,7 @@ def evaluate_candidate(applicant_data):
     Evaluate if a candidate meets shortlist criteria
     """
     try:
-        data = json.loads(applicant_data['Compressed JSON'])
+        data = decode_applicant(applicant_data['Compressed JSON'])
         
         # Initialize results
         criteria_met = {
@@ -101,7 +117,7 @@ def evaluate_candidate(applicant_data):
         reasons = []
         
         # 1. Experience Check
-        experience_data = data.get('experience', [])
+        experience_data = data.experience
         total_years = calculate_experience_years(experience_data)
         has_tier1, tier1_company = has_tier1_experience(experience_data)
         
@@ -115,10 +131,10 @@ def evaluate_candidate(applicant_data):
             reasons.append(f"Insufficient experience: {total_years} years, no Tier-1 companies")
         
         # 2. Compensation Check
-        salary_data = data.get('salary', {})
-        preferred_rate = salary_data.get('preferred_rate', 0)
-        availability = salary_data.get('availability', 0)
-        currency = salary_data.get('currency', 'USD')
+        salary_data = data.salary
+        preferred_rate = salary_data.preferred_rate
+        availability = salary_data.availability
+        currency = salary_data.currency
         
         if preferred_rate <= 100 and currency == 'USD' and availability >= 20:
             criteria_met['compensation'] = True
@@ -127,8 +143,7 @@ def evaluate_candidate(applicant_data):
             reasons.append(f"Compensation mismatch: ${preferred_rate}/hr {currency}, {availability} hrs/week")
         
         # 3. Location Check
-        personal_data = data.get('personal', {})
-        location = personal_data.get('location', '')
+        location = data.personal.location
         
         if check_location(location):
             criteria_met['location'] = True
@@ -149,7 +164,8 @@ def evaluate_candidate(applicant_data):
                 'rate': preferred_rate,
                 'currency': currency,
                 'availability': availability,
-                'location': location
+                'location': location,
+                'companies': sorted({exp.company.strip() for exp in experience_data if exp.company.strip()})
             }
         }
         
@@ -158,101 +174,176 @@ def evaluate_candidate(applicant_data):
             'qualified': False,
             'criteria_met': {'experience': False, 'compensation': False, 'location': False},
             'reasons': [f"Error evaluating candidate: {str(e)}"],
-            'summary': {}
+            'summary': {},
+            'error': True
         }
 
-def create_shortlisted_lead(applicant_record, evaluation_result):
+def build_lead_record(applicant_record, evaluation_result):
     """
-    Create a record in the Shortlisted Leads table
+    Build the Shortlisted Leads upsert payload for a qualified applicant
     """
-    try:
-        # Create the shortlisted lead record
-        lead_data = {
+    return {
+        'fields': {
+            # Merge key - Airtable cannot merge on linked record fields,
+            # so the lead carries a plain-text copy of the Applicant ID
+            'Applicant ID': applicant_record['fields']['Applicant ID'],
             'Applicant': [applicant_record['id']],  # Link to the applicant
             'Compressed JSON': applicant_record['fields']['Compressed JSON'],
             'Score Reason': '\n'.join(evaluation_result['reasons']),
             # 'Created At' is auto-populated by Airtable
         }
+    }
+
+def build_status_record(applicant_record, status):
+    """
+    Build the Applicants upsert payload for a Shortlist Status change
+    """
+    return {
+        'fields': {
+            'Applicant ID': applicant_record['fields']['Applicant ID'],
+            'Shortlist Status': status
+        }
+    }
+
+def upsert_shortlist_batch(lead_records, status_records):
+    """
+    Apply one batch of lead upserts followed by the matching status upserts.
+
+    Leads are written before statuses, so an applicant is only ever marked
+    'Shortlisted' once its lead exists. Both writes are keyed on Applicant ID,
+    which makes re-running a batch after a crash or retry a no-op.
+    """
+    if lead_records:
+        run_limited(AIRTABLE_LIMITER, shortlisted_table.batch_upsert, lead_records, key_fields=MERGE_FIELDS)
+    if status_records:
+        run_limited(AIRTABLE_LIMITER, applicants_table.batch_upsert, status_records, key_fields=MERGE_FIELDS)
+
+def create_shortlisted_lead(applicant_record, evaluation_result):
+    """
+    Create (or update) a record in the Shortlisted Leads table
+    """
+    try:
+        lead_record = build_lead_record(applicant_record, evaluation_result)
         
-        new_lead = shortlisted_table.create(lead_data)
+        result = run_limited(AIRTABLE_LIMITER, shortlisted_table.batch_upsert, [lead_record], key_fields=MERGE_FIELDS)
         
         # Update the applicant's shortlist status
-        applicants_table.update(applicant_record['id'], {
-            'Shortlist Status': 'Shortlisted'
-        })
+        run_limited(
+            AIRTABLE_LIMITER, applicants_table.batch_upsert,
+            [build_status_record(applicant_record, 'Shortlisted')],
+            key_fields=MERGE_FIELDS
+        )
         
-        return new_lead
+        return result['records'][0]
         
     except Exception as e:
-        print(f"❌ Error creating shortlisted lead: {str(e)}")
+        log.error(f"❌ Error creating shortlisted lead: {str(e)}")
         return None
 
-def process_all_applicants():
+def fetch_applicants():
+    return run_limited(AIRTABLE_LIMITER, applicants_table.all)
+
+def process_all_applicants(shard=None, all_applicants=None):
     """
-    Process all applicants and shortlist qualified candidates
+    Process all applicants (or one (index, count) shard) and shortlist qualified candidates.
+    Returns True if every batch was written.
     """
     try:
-        print("=== Lead Shortlist Automation ===")
+        log.info("=== Lead Shortlist Automation ===")
         
-        # Get all applicants with compressed JSON
-        all_applicants = applicants_table.all()
+        # Get all applicants with compressed JSON, unless a worker already fetched them
+        if all_applicants is None:
+            all_applicants = fetch_applicants()
         
         shortlisted_count = 0
         processed_count = 0
+        failed_batches = 0
+        
+        # Pending writes, flushed every UPSERT_BATCH_SIZE applicants
+        pending_leads = []
+        pending_statuses = []
+        pending_outcomes = []
+        
+        def flush():
+            nonlocal shortlisted_count, failed_batches
+            try:
+                upsert_shortlist_batch(pending_leads, pending_statuses)
+                shortlisted_count += len(pending_leads)
+            except Exception as e:
+                failed_batches += 1
+                log.error(f"❌ Error writing shortlist batch: {str(e)}")
+            pending_leads.clear()
+            pending_statuses.clear()
         
+        progress = Progress(log, "Shortlist", len(all_applicants))
         for applicant in all_applicants:
             applicant_id = applicant['fields'].get('Applicant ID')
             compressed_json = applicant['fields'].get('Compressed JSON')
             current_status = applicant['fields'].get('Shortlist Status')
             
-            if not applicant_id or not compressed_json:
-                print(f"⚠️  Skipping {applicant_id}: Missing data")
+            if applicant_id and not in_shard(applicant_id, shard):
+                progress.update(skipped=1)
                 continue
             
-            print(f"\n--- Evaluating {applicant_id} ---")
+            if not applicant_id or not compressed_json:
+                log.warning(f"⚠️  Skipping {applicant_id}: Missing data")
+                progress.update(skipped=1)
+                continue
             
             # Evaluate the candidate
             evaluation = evaluate_candidate(applicant['fields'])
             processed_count += 1
+            pending_outcomes.append((applicant_id, evaluation))
             
-            # Print evaluation results
-            print(f"Experience: {'✅' if evaluation['criteria_met']['experience'] else '❌'}")
-            print(f"Compensation: {'✅' if evaluation['criteria_met']['compensation'] else '❌'}")
-            print(f"Location: {'✅' if evaluation['criteria_met']['location'] else '❌'}")
-            print(f"Overall: {'✅ QUALIFIED' if evaluation['qualified'] else '❌ NOT QUALIFIED'}")
-            
-            # Update shortlist status
+            # Queue shortlist status changes
             if evaluation['qualified']:
                 if current_status != 'Shortlisted':
-                    lead = create_shortlisted_lead(applicant, evaluation)
-                    if lead:
-                        shortlisted_count += 1
-                        print(f"✅ Added to shortlist!")
-                    else:
-                        # Update status even if lead creation failed
-                        applicants_table.update(applicant['id'], {
-                            'Shortlist Status': 'Shortlisted'
-                        })
+                    pending_leads.append(build_lead_record(applicant, evaluation))
+                    pending_statuses.append(build_status_record(applicant, 'Shortlisted'))
+                    action = "queued for shortlist"
                 else:
-                    print(f"✅ Already shortlisted")
+                    action = "already shortlisted"
+            elif current_status != 'Not Shortlisted':
+                pending_statuses.append(build_status_record(applicant, 'Not Shortlisted'))
+                action = "queued as not shortlisted"
             else:
-                # Update to not shortlisted
-                applicants_table.update(applicant['id'], {
-                    'Shortlist Status': 'Not Shortlisted'
-                })
-                print(f"❌ Marked as not shortlisted")
+                action = "already marked as not shortlisted"
             
-            # Print reasons
-            print("Reasons:")
-            for reason in evaluation['reasons']:
-                print(f"  • {reason}")
+            # One line per applicant, and only when debug output is on
+            if log.isEnabledFor(logging.DEBUG):
+                criteria = evaluation['criteria_met']
+                log.debug(
+                    f"{'✅ QUALIFIED' if evaluation['qualified'] else '❌ NOT QUALIFIED'} "
+                    f"(experience {'✅' if criteria['experience'] else '❌'}, "
+                    f"compensation {'✅' if criteria['compensation'] else '❌'}, "
+                    f"location {'✅' if criteria['location'] else '❌'}): {action}",
+                    extra={'applicant_id': applicant_id, 'reasons': '; '.join(evaluation['reasons'])}
+                )
+            progress.update(qualified=int(evaluation['qualified']))
+            
+            if len(pending_statuses) >= UPSERT_BATCH_SIZE:
+                flush()
+            if len(pending_outcomes) >= STATS_BATCH_SIZE:
+                record_shortlist_outcomes(pending_outcomes)
+                pending_outcomes.clear()
+        
+        if pending_statuses:
+            flush()
+        record_shortlist_outcomes(pending_outcomes)
+        progress.finish()
         
-        print(f"\n=== Summary ===")
-        print(f"Processed: {processed_count} applicants")
-        print(f"Newly Shortlisted: {shortlisted_count}")
+        log.info("=== Summary ===")
+        log.info(f"Processed: {processed_count} applicants")
+        log.info(f"Newly Shortlisted: {shortlisted_count}")
+        if failed_batches:
+            log.warning(f"Failed batches: {failed_batches} (safe to re-run)")
+        return failed_batches == 0
         
     except Exception as e:
-        print(f"❌ Error processing applicants: {str(e)}")
+        log.error(f"❌ Error processing applicants: {str(e)}")
+        return False
 
 if __name__ == "__main__":
+    setup_logging_from_argv("Shortlist qualified applicants")
+    http_replay.install()
     process_all_applicants()
\ No newline at end of file
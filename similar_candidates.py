@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+import numpy as np
+from dotenv import load_dotenv
+from applicant_model import decode_applicant, ApplicantDecodeError
+
+# Load environment variables
+load_dotenv()
+
+SIMILARITY_DB_PATH = os.getenv('SIMILARITY_DB_PATH', 'similar_candidates.db')
+
+# Hashed TF-IDF features are projected onto EMBEDDING_DIM dimensions with
+# per-feature random vectors (Johnson-Lindenstrauss), so cosine similarity in
+# the small dense space approximates cosine similarity of the full vectors
+EMBEDDING_DIM = 256
+
+def normalize_text(text):
+    return ' '.join(re.findall(r'[a-z0-9+#.]+', (text or '').lower()))
+
+def extract_features(applicant):
+    """
+    Feature counts from titles, companies and technologies
+    """
+    features = {}
+    for exp in applicant.experience:
+        tokens = ['t:' + t for t in normalize_text(exp.title).split()]
+        if exp.company.strip():
+            tokens.append('c:' + normalize_text(exp.company))
+        tokens += ['x:' + normalize_text(tech) for tech in exp.technologies.split(',') if tech.strip()]
+        for token in tokens:
+            features[token] = features.get(token, 0) + 1
+    return features
+
+@lru_cache(maxsize=65536)
+def feature_vector(feature):
+    """
+    Deterministic random direction for a feature (same on every machine)
+    """
+    seed = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+    return np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+
+class SimilarityIndex:
+    """
+    Local, incrementally updated index of applicant embeddings.
+
+    Embeddings and document frequencies live in SQLite so compression runs and
+    workers can update it concurrently; queries load the embeddings once into a
+    matrix and score all applicants with one matrix-vector product.
+    """
+
+    def __init__(self, path=SIMILARITY_DB_PATH):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                applicant_id TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                features TEXT
+            )
+        """)
+        # Features each applicant added to document_frequency, so they can be
+        # taken out again when it is removed (added to older databases here)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(embeddings)")}
+        if 'features' not in columns:
+            self.conn.execute("ALTER TABLE embeddings ADD COLUMN features TEXT")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS document_frequency (
+                feature TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            )
+        """)
+        self._ids = None
+        self._positions = None
+        self._matrix = None
+
+    @staticmethod
+    def _embed(features, dfs, total):
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for feature, count in features.items():
+            idf = np.log((1 + total) / (1 + dfs.get(feature, 0))) + 1
+            vector += (1 + np.log(count)) * idf * feature_vector(feature)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def upsert(self, applicant_id, applicant):
+        """
+        Add or refresh one applicant's embedding; an applicant with no
+        features left (e.g. all experience removed) is dropped from the index
+        """
+        features = extract_features(applicant)
+        if not features:
+            self.remove(applicant_id)
+            return
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                is_new = self.conn.execute(
+                    "SELECT 1 FROM embeddings WHERE applicant_id = ?", (applicant_id,)
+                ).fetchone() is None
+                if is_new:
+                    # Re-indexed applicants keep their original contribution to
+                    # document frequencies; rebuild_index() recomputes them exactly
+                    self.conn.executemany(
+                        "INSERT INTO document_frequency (feature, df) VALUES (?, 1) "
+                        "ON CONFLICT(feature) DO UPDATE SET df = df + 1",
+                        [(feature,) for feature in features]
+                    )
+                total = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] + is_new
+                placeholders = ','.join('?' * len(features))
+                dfs = dict(self.conn.execute(
+                    f"SELECT feature, df FROM document_frequency WHERE feature IN ({placeholders})",
+                    list(features)
+                ))
+                vector = self._embed(features, dfs, total)
+                # features is only written for new rows: it records the df contribution
+                self.conn.execute(
+                    "INSERT INTO embeddings (applicant_id, vector, features) VALUES (?, ?, ?) "
+                    "ON CONFLICT(applicant_id) DO UPDATE SET vector = excluded.vector",
+                    (applicant_id, vector.tobytes(), json.dumps(sorted(features)))
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._matrix = None  # Reload on next query
+
+    def remove(self, applicant_id):
+        """
+        Drop an applicant's embedding and its document frequency contribution
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT features FROM embeddings WHERE applicant_id = ?", (applicant_id,)
+                ).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return False
+                self.conn.execute("DELETE FROM embeddings WHERE applicant_id = ?", (applicant_id,))
+                features = json.loads(row[0]) if row[0] else []
+                self.conn.executemany(
+                    "UPDATE document_frequency SET df = df - 1 WHERE feature = ?",
+                    [(feature,) for feature in features]
+                )
+                self.conn.executemany(
+                    "DELETE FROM document_frequency WHERE feature = ? AND df <= 0",
+                    [(feature,) for feature in features]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._matrix = None
+        return True
+
+    def replace_all(self, applicants):
+        """
+        Replace the whole index with (Applicant ID, Applicant) pairs in one transaction
+        """
+        features_by_id = {}
+        dfs = {}
+        for applicant_id, applicant in applicants:
+            features = extract_features(applicant)
+            if features:
+                features_by_id[applicant_id] = features
+                for feature in features:
+                    dfs[feature] = dfs.get(feature, 0) + 1
+
+        total = len(features_by_id)
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM embeddings")
+                self.conn.execute("DELETE FROM document_frequency")
+                self.conn.executemany(
+                    "INSERT INTO document_frequency (feature, df) VALUES (?, ?)", dfs.items()
+                )
+                self.conn.executemany(
+                    "INSERT INTO embeddings (applicant_id, vector, features) VALUES (?, ?, ?)",
+                    [
+                        (applicant_id, self._embed(features, dfs, total).tobytes(),
+                         json.dumps(sorted(features)))
+                        for applicant_id, features in features_by_id.items()
+                    ]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._matrix = None
+        return total
+
+    def _load(self):
+        if self._matrix is None:
+            rows = self.conn.execute("SELECT applicant_id, vector FROM embeddings").fetchall()
+            self._ids = [applicant_id for applicant_id, _ in rows]
+            self._positions = {applicant_id: i for i, applicant_id in enumerate(self._ids)}
+            self._matrix = (
+                np.frombuffer(b''.join(vector for _, vector in rows), dtype=np.float32)
+                .reshape(len(rows), EMBEDDING_DIM)
+            )
+        return self._ids, self._matrix
+
+    def most_similar(self, applicant_id, top_k=10):
+        """
+        Top-k applicants most similar to an indexed applicant, as (Applicant ID, score)
+        """
+        ids, matrix = self._load()
+        position = self._positions.get(applicant_id)
+        if position is None:
+            return []
+        scores = matrix @ matrix[position]
+        scores[position] = -np.inf
+        k = min(top_k, len(ids) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+def rebuild_index(index=None):
+    """
+    Rebuild the index from every applicant's Compressed JSON
+    """
+    # Imported here because json_compression updates this index
+    from json_compression import applicants_table
+
+    try:
+        print("=== Rebuilding Similar Candidates Index ===")
+        index = index or SimilarityIndex()
+        records = applicants_table.all(fields=['Applicant ID', 'Compressed JSON'])
+        applicants = []
+        for record in records:
+            applicant_id = record['fields'].get('Applicant ID')
+            compressed_json = record['fields'].get('Compressed JSON')
+            if not applicant_id or not compressed_json:
+                continue
+            try:
+                applicants.append((applicant_id, decode_applicant(compressed_json)))
+            except ApplicantDecodeError as e:
+                print(f"⚠️  Skipping {applicant_id}: {str(e)}")
+
+        indexed = index.replace_all(applicants)
+        print(f"✅ Indexed {indexed} applicants")
+
+    except Exception as e:
+        print(f"❌ Error rebuilding index: {str(e)}")
+
+def show_similar(applicant_id, top_k=10):
+    matches = SimilarityIndex().most_similar(applicant_id, top_k)
+    if not matches:
+        print(f"❌ {applicant_id} is not in the index")
+        return
+    print(f"=== Candidates similar to {applicant_id} ===")
+    for other, score in matches:
+        print(f"  {other}: {score:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find candidates similar to an applicant")
+    parser.add_argument('applicant_id', nargs='?')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the index from Airtable")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_index()
+    if args.applicant_id:
+        show_similar(args.applicant_id, args.top)
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import zlib
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+# Defaults, overridable from .env or the -v / -q / --log-json flags
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')             # 'text' or 'json'
+DEBUG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+PROGRESS_INTERVAL = 10       # Seconds between progress summaries
+FLUSH_INTERVAL = 1.0         # Seconds a buffered line may wait before being written
+FLUSH_CAPACITY = 512         # Lines buffered before a forced write
+
+# Attributes every LogRecord has; anything else was passed as structured fields
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRS}
+
+class TextFormatter(logging.Formatter):
+    """
+    "12:00:01 INFO    message key=value ..." lines
+    """
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(message)s', datefmt='%H:%M:%S')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, for log shippers
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class DebugSampler(logging.Filter):
+    """
+    Keep a fixed fraction of per-record DEBUG output.
+
+    Sampling is keyed on the record's applicant_id, so either every debug
+    line for an applicant is kept or none are. Records without an
+    applicant_id and anything above DEBUG always pass.
+    """
+
+    def __init__(self, rate=DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.threshold = int(rate * 0xFFFFFFFF)
+
+    def filter(self, record):
+        applicant_id = getattr(record, 'applicant_id', None)
+        if record.levelno > logging.DEBUG or applicant_id is None:
+            return True
+        return zlib.crc32(str(applicant_id).encode('utf-8')) <= self.threshold
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler that writes lines in batches instead of one at a time.
+
+    Formatted lines are held in memory and written with a single write() and
+    flush(): immediately for warnings and errors, otherwise once
+    FLUSH_CAPACITY lines are pending or FLUSH_INTERVAL has passed. The
+    buffer does not rely on the stream's own buffering, which is line- or
+    write-through for terminals and stderr.
+    """
+
+    def __init__(self, stream=None, capacity=FLUSH_CAPACITY, interval=FLUSH_INTERVAL):
+        super().__init__(stream)
+        self.capacity = capacity
+        self.interval = interval
+        self._lines = []
+        self._last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            self._lines.append(self.format(record) + self.terminator)
+            if record.levelno >= logging.WARNING or len(self._lines) >= self.capacity:
+                self.flush()
+            else:
+                self.flush_if_due()
+        except Exception:
+            self.handleError(record)
+
+    def flush_if_due(self):
+        if self._lines and time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._lines:
+                self.stream.write(''.join(self._lines))
+                self._lines.clear()
+            super().flush()
+            self._last_flush = time.monotonic()
+        finally:
+            self.release()
+
+class FlushingQueueListener(QueueListener):
+    """
+    QueueListener that also flushes due lines while the queue is idle, so
+    the last lines of a quiet stretch are not held until the next record
+    """
+
+    def __init__(self, log_queue, *handlers, interval=FLUSH_INTERVAL):
+        super().__init__(log_queue, *handlers)
+        self.interval = interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    if isinstance(handler, BufferedStreamHandler):
+                        handler.flush_if_due()
+
+    def stop(self):
+        super().stop()
+        for handler in self.handlers:
+            handler.flush()
+
+def setup_logging(verbosity=0, log_format=None, stream=None):
+    """
+    Configure the root logger once per process.
+
+    verbosity: -1 warnings only, 0 progress summaries (default), 1 adds sampled
+    per-record debug lines, 2 adds every debug line. Callers only enqueue
+    records; formatting and terminal I/O happen on a background thread.
+    Output goes to stdout unless another stream is given.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    if verbosity < 0:
+        level = logging.WARNING
+    elif verbosity > 0:
+        level = logging.DEBUG
+    else:
+        level = logging.getLevelName(LOG_LEVEL.upper())
+
+    handler = BufferedStreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if (log_format or LOG_FORMAT) == 'json' else TextFormatter())
+    if verbosity == 1:
+        handler.addFilter(DebugSampler())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+    # httpx logs every request at INFO; keep it to warnings unless -vv
+    logging.getLogger('httpx').setLevel(logging.DEBUG if verbosity > 1 else logging.WARNING)
+
+    _listener = FlushingQueueListener(log_queue, handler)
+    _listener.start()
+    return _listener
+
+def shutdown_logging():
+    """
+    Drain the queue and flush buffered lines
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown_logging)
+
+def add_logging_args(parser):
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="-v: sampled per-record debug output, -vv: all of it")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only warnings and errors")
+    parser.add_argument('--log-json', action='store_true', help="Emit JSON log lines")
+
+def setup_logging_from_args(args):
+    return setup_logging(-1 if args.quiet else args.verbose, 'json' if args.log_json else None)
+
+def setup_logging_from_argv(description=None):
+    """
+    For scripts without their own argument parser
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description=description)
+    add_logging_args(parser)
+    return setup_logging_from_args(parser.parse_args())
+
+class Progress:
+    """
+    Periodic progress summary (done/total, rate, ETA) for long loops
+    """
+
+    def __init__(self, logger, label, total, interval=PROGRESS_INTERVAL):
+        self.logger = logger
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.counts = {}
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def update(self, n=1, **counts):
+        """
+        Record n finished items, plus any named counters (e.g. failed=1).
+        Returns True when a summary was logged.
+        """
+        self.done += n
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+            return True
+        return False
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.done, 0)
+        eta = f"{remaining / rate:.0f}s" if rate > 0 else "?"
+        percent = 100 * self.done / self.total if self.total else 100
+        self.logger.info(
+            f"📊 {self.label}: {self.done}/{self.total} ({percent:.0f}%), {rate:.1f}/s, ETA {eta}",
+            extra=dict(self.counts)
+        )
+
+    def finish(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        self.logger.info(f"📊 {self.label}: {self.done} done in {elapsed:.1f}s ({rate:.1f}/s)",
+                         extra=dict(self.counts))
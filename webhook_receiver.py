@@ -0,0 +1,295 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+from json_compression import compress_applicant_data, applicants_table, base
+from shortlist_automation import (
+    evaluate_candidate, build_lead_record, build_status_record, upsert_shortlist_batch
+)
+from funnel_stats import record_shortlist_outcomes
+from adaptive_concurrency import AIRTABLE_LIMITER, run_limited
+import gemini_llm_evaluation
+from structured_logging import setup_logging_from_argv
+
+# Load environment variables
+load_dotenv()
+
+log = logging.getLogger('webhook_receiver')
+
+# Receiver configuration; binds to localhost unless WEBHOOK_HOST says otherwise
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_EVENTS_SECRET = os.getenv('WEBHOOK_EVENTS_SECRET')  # Required on /events when set
+AIRTABLE_WEBHOOK_ID = os.getenv('AIRTABLE_WEBHOOK_ID')
+AIRTABLE_WEBHOOK_MAC_SECRET = os.getenv('AIRTABLE_WEBHOOK_MAC_SECRET')  # macSecretBase64
+WEBHOOK_CURSOR_PATH = os.getenv('WEBHOOK_CURSOR_PATH', 'webhook_cursor.txt')
+
+DEBOUNCE_SECONDS = 5       # Quiet period after the last edit before processing
+MAX_DEBOUNCE_SECONDS = 30  # Upper bound on how long a busy applicant can be delayed
+
+WATCHED_TABLES = ['Applicants', 'Personal Details', 'Work Experience', 'Salary Preferences']
+
+class DebouncedQueue:
+    """
+    Coalesces bursts of events per Applicant ID and hands each applicant to
+    `handler` once its edits have been quiet for `delay` seconds
+    """
+
+    def __init__(self, handler, delay=DEBOUNCE_SECONDS, max_delay=MAX_DEBOUNCE_SECONDS):
+        self.handler = handler
+        self.delay = delay
+        self.max_delay = max_delay
+        self._condition = threading.Condition()
+        self._due = {}
+        self._first_seen = {}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __len__(self):
+        with self._condition:
+            return len(self._due)
+
+    def start(self):
+        self._thread.start()
+
+    def push(self, applicant_id):
+        now = time.monotonic()
+        with self._condition:
+            first_seen = self._first_seen.setdefault(applicant_id, now)
+            self._due[applicant_id] = min(now + self.delay, first_seen + self.max_delay)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    ready = [a for a, due in self._due.items() if due <= now]
+                    if ready:
+                        break
+                    next_due = min(self._due.values(), default=None)
+                    self._condition.wait(timeout=None if next_due is None else next_due - now)
+                for applicant_id in ready:
+                    del self._due[applicant_id]
+                    del self._first_seen[applicant_id]
+
+            for applicant_id in ready:
+                try:
+                    self.handler(applicant_id)
+                except Exception as e:
+                    log.error(f"❌ Error processing {applicant_id}: {str(e)}")
+
+def process_applicant(applicant_id):
+    """
+    Run one applicant through compression, shortlisting and the Gemini step
+    """
+    log.info(f"--- Processing {applicant_id} ---")
+
+    json_string = compress_applicant_data(applicant_id)
+    if not json_string:
+        return
+
+    records = run_limited(AIRTABLE_LIMITER, applicants_table.all,
+                          formula=f"{{Applicant ID}} = '{applicant_id}'")
+    if not records:
+        return
+    record = records[0]
+    record['fields']['Compressed JSON'] = json_string
+
+    # Shortlist
+    evaluation = evaluate_candidate(record['fields'])
+    if evaluation['qualified']:
+        upsert_shortlist_batch(
+            [build_lead_record(record, evaluation)],
+            [build_status_record(record, 'Shortlisted')]
+        )
+    else:
+        upsert_shortlist_batch([], [build_status_record(record, 'Not Shortlisted')])
+    record_shortlist_outcomes([(applicant_id, evaluation)])
+    log.info(f"Overall: {'✅ QUALIFIED' if evaluation['qualified'] else '❌ NOT QUALIFIED'}",
+             extra={'applicant_id': applicant_id})
+
+    # LLM evaluation, only if the stored result is stale
+    if gemini_llm_evaluation.GEMINI_API_KEY and gemini_llm_evaluation.find_stale_applicants([record]):
+        gemini_llm_evaluation.evaluate_applicant_with_gemini(record)
+
+class AirtableChangeResolver:
+    """
+    Maps Airtable webhook payloads to the Applicant IDs they touch
+    """
+
+    def __init__(self):
+        self.tables_by_id = {
+            table.id: table.name for table in base.schema().tables if table.name in WATCHED_TABLES
+        }
+        self._applicant_ids = {}  # Applicants record ID -> Applicant ID
+        self._lock = threading.Lock()
+        # Writes made by these scripts come back as 'publicApi' events from the
+        # token's user; skipping only those stops the receiver re-triggering
+        # itself while API writes from other integrations are still processed
+        self.own_user_id = base.api.whoami()['id']
+
+    def is_own_write(self, payload):
+        metadata = payload.action_metadata
+        if metadata is None or metadata.source != 'publicApi':
+            return False
+        user = (metadata.source_metadata or {}).get('user') or {}
+        return user.get('id') == self.own_user_id
+
+    def applicant_id_for(self, applicant_record_id):
+        if applicant_record_id not in self._applicant_ids:
+            record = run_limited(AIRTABLE_LIMITER, applicants_table.get, applicant_record_id)
+            self._applicant_ids[applicant_record_id] = record['fields'].get('Applicant ID')
+        return self._applicant_ids[applicant_record_id]
+
+    def applicant_ids_for(self, table_name, record_id):
+        if table_name == 'Applicants':
+            return [self.applicant_id_for(record_id)]
+        # Child tables link back to Applicants through their 'Applicant ID' field
+        record = run_limited(AIRTABLE_LIMITER, base.table(table_name).get, record_id)
+        return [self.applicant_id_for(linked) for linked in record['fields'].get('Applicant ID', [])]
+
+    def fetch_changes(self):
+        """
+        Read new payloads since the stored cursor and return the affected Applicant IDs
+        """
+        with self._lock:
+            cursor = 1
+            if os.path.exists(WEBHOOK_CURSOR_PATH):
+                with open(WEBHOOK_CURSOR_PATH) as f:
+                    cursor = int(f.read().strip() or 1)
+
+            applicant_ids = set()
+            webhook = base.webhook(AIRTABLE_WEBHOOK_ID)
+            for payload in webhook.payloads(cursor=cursor):
+                if not self.is_own_write(payload) and not self._resolve_payload(payload, applicant_ids):
+                    # Keep the cursor on this payload so the next ping retries it
+                    log.warning(f"⚠️  Stopping at payload {payload.cursor}; it will be re-read next time")
+                    break
+                cursor = payload.cursor + 1
+
+            with open(WEBHOOK_CURSOR_PATH, 'w') as f:
+                f.write(str(cursor))
+            return {a for a in applicant_ids if a}
+
+    def _resolve_payload(self, payload, applicant_ids):
+        """
+        Add the Applicant IDs a payload touches; False if any record could not be resolved
+        """
+        for table_id, changes in payload.changed_tables_by_id.items():
+            table_name = self.tables_by_id.get(table_id)
+            if not table_name:
+                continue
+            record_ids = list(changes.created_records_by_id) + list(changes.changed_records_by_id)
+            for record_id in record_ids:
+                try:
+                    applicant_ids.update(self.applicant_ids_for(table_name, record_id))
+                except Exception as e:
+                    if getattr(getattr(e, 'response', None), 'status_code', None) == 404:
+                        # Deleted since the change; nothing left to process
+                        continue
+                    log.warning(f"⚠️  Could not resolve {table_name} record {record_id}: {str(e)}")
+                    return False
+        return True
+
+def verify_mac(body, header):
+    """
+    Check Airtable's X-Airtable-Content-MAC header when a MAC secret is configured
+    """
+    if not AIRTABLE_WEBHOOK_MAC_SECRET:
+        return True
+    expected = "hmac-sha256=" + hmac.new(
+        base64.b64decode(AIRTABLE_WEBHOOK_MAC_SECRET), body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, header or "")
+
+def verify_events_secret(header):
+    """
+    Check 'Authorization: Bearer <WEBHOOK_EVENTS_SECRET>' when a secret is configured
+    """
+    if not WEBHOOK_EVENTS_SECRET:
+        return True
+    return hmac.compare_digest(f"Bearer {WEBHOOK_EVENTS_SECRET}", header or "")
+
+def make_handler(queue, resolver):
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, {'status': 'ok', 'queued': len(queue)})
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            if self.path == '/airtable':
+                # Notification ping: acknowledge now, fetch payloads in the background
+                if resolver is None:
+                    self._reply(503, {'error': 'AIRTABLE_WEBHOOK_ID not configured'})
+                    return
+                if not verify_mac(body, self.headers.get('X-Airtable-Content-MAC')):
+                    self._reply(401, {'error': 'invalid MAC'})
+                    return
+                self._reply(200, {'status': 'accepted'})
+                threading.Thread(target=self._enqueue_airtable_changes, daemon=True).start()
+
+            elif self.path == '/events':
+                # Local stand-in: {"applicant_id": "APP001"} or {"applicant_ids": [...]}
+                if not verify_events_secret(self.headers.get('Authorization')):
+                    self._reply(401, {'error': 'invalid or missing token'})
+                    return
+                try:
+                    event = json.loads(body or b'{}')
+                except json.JSONDecodeError:
+                    self._reply(400, {'error': 'invalid JSON'})
+                    return
+                applicant_ids = event.get('applicant_ids') or [event.get('applicant_id')]
+                applicant_ids = [a for a in applicant_ids if a]
+                for applicant_id in applicant_ids:
+                    queue.push(applicant_id)
+                self._reply(202, {'queued': applicant_ids})
+
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def _enqueue_airtable_changes(self):
+            try:
+                for applicant_id in resolver.fetch_changes():
+                    queue.push(applicant_id)
+            except Exception as e:
+                log.error(f"❌ Error reading webhook payloads: {str(e)}")
+
+        def log_message(self, format, *args):
+            pass  # Keep the console for processing output
+
+    return WebhookHandler
+
+def run_server(host=WEBHOOK_HOST, port=WEBHOOK_PORT):
+    queue = DebouncedQueue(process_applicant)
+    queue.start()
+    resolver = AirtableChangeResolver() if AIRTABLE_WEBHOOK_ID else None
+
+    server = ThreadingHTTPServer((host, port), make_handler(queue, resolver))
+    log.info(f"=== Webhook Receiver listening on {host}:{port} ===")
+    if host not in ('127.0.0.1', 'localhost', '::1') and not WEBHOOK_EVENTS_SECRET:
+        log.warning("⚠️  /events is reachable from the network without WEBHOOK_EVENTS_SECRET")
+    if resolver is None:
+        log.warning("⚠️  AIRTABLE_WEBHOOK_ID not set: only local /events are accepted")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    setup_logging_from_argv("Receive Airtable change notifications and reprocess applicants")
+    run_server()
@@ -0,0 +1,239 @@
+import os
+import time
+import uuid
+import zlib
+import socket
+import logging
+import sqlite3
+import argparse
+import importlib
+import threading
+from dotenv import load_dotenv
+from structured_logging import add_logging_args, setup_logging_from_args
+import http_replay
+
+# Load environment variables
+load_dotenv()
+
+# Local lease store shared by every worker on this host (or on a shared volume)
+LEASE_DB_PATH = os.getenv('LEASE_DB_PATH', 'shard_leases.db')
+LEASE_TTL = 60  # Seconds a lease survives without a heartbeat
+MAX_SHARD_ATTEMPTS = 3  # Failed passes over one shard before this worker gives up
+SHARD_RETRY_DELAY = 30  # Seconds to wait before retrying after a failed pass
+
+# Jobs that can run in worker mode: name -> (module, job function, fetch function).
+# The fetch function reads the Applicants table once per worker; each shard
+# pass gets those records and returns True only if the shard fully succeeded.
+JOBS = {
+    'compress': ('json_compression', 'compress_all_applicants', 'fetch_applicants'),
+    'shortlist': ('shortlist_automation', 'process_all_applicants', 'fetch_applicants'),
+    'evaluate': ('gemini_llm_evaluation', 'process_all_applicants', 'fetch_applicants'),
+}
+
+log = logging.getLogger('worker_shards')
+
+def shard_of(applicant_id, shard_count):
+    """
+    Stable shard index for an Applicant ID (identical across processes and hosts)
+    """
+    return zlib.crc32(applicant_id.encode('utf-8')) % shard_count
+
+def in_shard(applicant_id, shard):
+    """
+    Check whether an applicant belongs to shard = (index, count); None means all
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    return shard_of(applicant_id, count) == index
+
+class LeaseStore:
+    """
+    SQLite-backed shard leases, one row per (run, shard)
+    """
+
+    def __init__(self, path=LEASE_DB_PATH):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                run_id TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                owner TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (run_id, shard)
+            )
+        """)
+
+    def claim(self, run_id, shard_count, owner, ttl=LEASE_TTL, skip=()):
+        """
+        Claim the first shard that is neither done, leased nor in `skip`;
+        returns its index or None
+        """
+        now = time.time()
+        # IMMEDIATE takes the write lock up front so two workers cannot claim the same shard
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = {
+                shard: (done, expires_at) for shard, done, expires_at in self.conn.execute(
+                    "SELECT shard, done, expires_at FROM leases WHERE run_id = ?", (run_id,)
+                )
+            }
+            for shard in range(shard_count):
+                done, expires_at = rows.get(shard, (0, 0))
+                if not done and expires_at < now and shard not in skip:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO leases (run_id, shard, owner, expires_at, done) "
+                        "VALUES (?, ?, ?, ?, 0)",
+                        (run_id, shard, owner, now + ttl)
+                    )
+                    self.conn.execute("COMMIT")
+                    return shard
+            self.conn.execute("COMMIT")
+            return None
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def renew(self, run_id, shard, owner, ttl=LEASE_TTL):
+        """
+        Extend a lease; returns False if another worker has taken it over
+        """
+        cursor = self.conn.execute(
+            "UPDATE leases SET expires_at = ? WHERE run_id = ? AND shard = ? AND owner = ? AND done = 0",
+            (time.time() + ttl, run_id, shard, owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, run_id, shard, owner):
+        """
+        Mark a shard as done; returns False if the lease was lost
+        """
+        cursor = self.conn.execute(
+            "UPDATE leases SET done = 1, expires_at = 0 WHERE run_id = ? AND shard = ? AND owner = ?",
+            (run_id, shard, owner)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, run_id, shard, owner):
+        """
+        Give up a lease without completing it, so the shard can be claimed again
+        """
+        self.conn.execute(
+            "UPDATE leases SET expires_at = 0 WHERE run_id = ? AND shard = ? AND owner = ? AND done = 0",
+            (run_id, shard, owner)
+        )
+
+    def remaining(self, run_id, shard_count, skip=()):
+        """
+        Number of shards not yet done in this run, not counting those in `skip`
+        """
+        done = {shard for shard, in self.conn.execute(
+            "SELECT shard FROM leases WHERE run_id = ? AND done = 1", (run_id,)
+        )}
+        return sum(1 for shard in range(shard_count) if shard not in done and shard not in skip)
+
+class LeaseHeartbeat:
+    """
+    Background thread that keeps a shard lease alive while the job runs
+    """
+
+    def __init__(self, run_id, shard, owner, ttl=LEASE_TTL):
+        self.run_id = run_id
+        self.shard = shard
+        self.owner = owner
+        self.ttl = ttl
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        store = LeaseStore()  # SQLite connections are per-thread
+        while not self._stop.wait(self.ttl / 3):
+            if not store.renew(self.run_id, self.shard, self.owner, self.ttl):
+                log.warning(f"⚠️  Lost lease on shard {self.shard}")
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_worker(job_name, run_id, shard_count, ttl=LEASE_TTL):
+    """
+    Process shards of the Applicants table until every shard of the run is done.
+
+    Shards whose owner crashed become claimable once their lease expires, so
+    any surviving worker picks them up. A shard is only marked done when its
+    pass succeeds; a failed pass releases the lease so the shard is retried.
+    Jobs write idempotently, so re-processing a shard produces no duplicates.
+    The Applicants table is fetched once per worker and partitioned locally.
+    """
+    module_name, function_name, fetch_name = JOBS[job_name]
+    module = importlib.import_module(module_name)
+    job = getattr(module, function_name)
+    fetch = getattr(module, fetch_name)
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    store = LeaseStore()
+    log.info(f"=== Worker {owner}: {job_name} run '{run_id}' over {shard_count} shards ===")
+
+    completed = 0
+    applicants = None
+    attempts = {}
+    given_up = set()  # Shards this worker failed MAX_SHARD_ATTEMPTS times
+    while True:
+        shard = store.claim(run_id, shard_count, owner, ttl, skip=given_up)
+        if shard is None:
+            if store.remaining(run_id, shard_count, skip=given_up) == 0:
+                break
+            # Remaining shards are leased by other workers; wait in case one expires
+            time.sleep(ttl / 2)
+            continue
+
+        log.info(f">>> Shard {shard + 1}/{shard_count}")
+        with LeaseHeartbeat(run_id, shard, owner, ttl) as heartbeat:
+            try:
+                if applicants is None:
+                    applicants = fetch()
+                    log.info(f"Fetched {len(applicants)} applicants for this worker")
+                succeeded = job(shard=(shard, shard_count), all_applicants=applicants)
+            except Exception as e:
+                log.error(f"❌ Error processing shard {shard + 1}: {str(e)}")
+                succeeded = False
+
+        if succeeded:
+            if not heartbeat.lost and store.complete(run_id, shard, owner):
+                completed += 1
+            continue
+
+        store.release(run_id, shard, owner)
+        attempts[shard] = attempts.get(shard, 0) + 1
+        if attempts[shard] >= MAX_SHARD_ATTEMPTS:
+            log.error(f"❌ Shard {shard + 1} failed {attempts[shard]} times; leaving it for another worker")
+            given_up.add(shard)
+            continue
+        log.warning(f"⚠️  Shard {shard + 1} failed, retrying in {SHARD_RETRY_DELAY}s")
+        time.sleep(SHARD_RETRY_DELAY)
+
+    log.info(f"=== Worker {owner} finished: {completed} shards ===")
+    if given_up:
+        log.error(f"❌ Gave up on shards {', '.join(str(s + 1) for s in sorted(given_up))}; "
+                  f"they are not done in run '{run_id}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a job over one shard of applicants at a time")
+    parser.add_argument('job', choices=sorted(JOBS))
+    parser.add_argument('--shards', type=int, required=True, help="Total number of shards")
+    parser.add_argument('--run-id', required=True, help="Shared by all workers of one run")
+    parser.add_argument('--lease-ttl', type=float, default=LEASE_TTL)
+    add_logging_args(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    http_replay.install()
+
+    run_worker(args.job, args.run_id, args.shards, args.lease_ttl)